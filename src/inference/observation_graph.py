@@ -0,0 +1,50 @@
+import sys
+import os
+training_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'training'))
+sys.path.insert(0, training_dir)
+import torch
+from export_policy import graph_adjacency
+from topology import check_topology, topology_adjacency
+
+class ObservationGraphBuilder:
+    """
+    Build the inputs of the dense GCN engine (DenseGCN.forward_dense) without torch_geometric.
+
+    build() copies [B, N, F] observations into a reused [B, N, F + 1] buffer whose last column
+    holds the agent ids, and returns it with the adjacency mask of the agent graph: the fully
+    connected [N, N] graph the checkpoints were trained on, including GraphBuilder's extra
+    (0, 0) edge, or a [B, N, N] "knn" / "radius" graph recomputed from the agent positions
+    (node feature columns 0:2). The node features alias the buffer until the next build.
+    """
+
+    def __init__(self, n_agents, topology="full", k=None, radius=None):
+        check_topology(topology, k, radius)
+        self.n_agents = n_agents
+        self.topology = topology
+        self.k = k
+        self.radius = radius
+        self.adjacency = graph_adjacency(n_agents)
+        self.buffers = {}
+
+    def _allocate(self, batch_size, n_features, dtype, device):
+        buffer = torch.empty(batch_size, self.n_agents, n_features + 1, dtype=dtype, device=device)
+        buffer[..., -1] = torch.arange(self.n_agents, dtype=dtype, device=device)
+        return buffer
+
+    def build(self, observations):
+        """
+        Returns:
+        tuple: ([B, N, F + 1] node features, [N, N] or [B, N, N] boolean adjacency).
+        """
+        batch_size, _, n_features = observations.shape
+        key = (batch_size, n_features, observations.dtype, observations.device)
+        if key not in self.buffers:
+            self.buffers[key] = self._allocate(batch_size, n_features, observations.dtype, observations.device)
+        node_features = self.buffers[key]
+        node_features[..., :n_features].copy_(observations)
+
+        if self.topology == "full":
+            if self.adjacency.device != observations.device:
+                self.adjacency = self.adjacency.to(observations.device)
+            return node_features, self.adjacency
+        return node_features, topology_adjacency(observations[..., :2], self.topology, self.k, self.radius)
@@ -0,0 +1,136 @@
+import sys
+import os
+training_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'training'))
+sys.path.insert(0, training_dir)
+import threading
+from collections import OrderedDict
+import torch
+from dense_gat import DenseGCN
+from export_policy import graph_adjacency, load_frozen_policy, load_policy
+from observation_graph import ObservationGraphBuilder
+
+ENGINES = ("dense", "sparse", "frozen")
+PRECISIONS = ("float32", "bfloat16")
+
+class Policy:
+    """
+    Greedy inference with a GCN policy: [B, N, F] observations of a StackedEnv in, [B, N,
+    n_actions] Q-values out, under torch.no_grad.
+
+    engine "dense" runs DenseGCN on ObservationGraphBuilder inputs (sparse models are converted
+    with DenseGCN.from_sparse), "sparse" runs the torch_geometric GCN on GraphBuilder batches,
+    and TorchScript exports (see export_policy) are "frozen": they take the observations as they
+    are. With precision "bfloat16" the eager engines run under autocast.
+    """
+
+    def __init__(self, model, n_agents, engine="dense", topology="full", k=None, radius=None, precision="float32"):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {list(PRECISIONS)}")
+        if isinstance(model, torch.jit.ScriptModule):
+            if precision != "float32":
+                raise ValueError("Frozen policies run in the precision they were exported with")
+            if topology != "full":
+                raise ValueError("Frozen policies have the fully connected topology baked in")
+            engine = "frozen"
+        elif engine == "dense":
+            if not isinstance(model, DenseGCN):
+                model = DenseGCN.from_sparse(model, graph_adjacency(n_agents))
+            self.graph_builder = ObservationGraphBuilder(n_agents, topology=topology, k=k, radius=radius)
+        elif engine == "sparse":
+            from graph_builder import GraphBuilder
+            self.graph_builder = GraphBuilder(n_agents, topology=topology, k=k, radius=radius)
+        else:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {list(ENGINES)}")
+        self.model = model
+        self.n_agents = n_agents
+        self.engine = engine
+        self.precision = precision
+
+    def __call__(self, observations):
+        batch_size = observations.shape[0]
+        with torch.no_grad(), torch.autocast(observations.device.type, dtype=torch.bfloat16, enabled=self.precision == "bfloat16"):
+            if self.engine == "frozen":
+                return self.model(observations)
+            if self.engine == "dense":
+                return self.model.forward_dense(*self.graph_builder.build(observations))
+            return self.model(self.graph_builder.build(observations)).view(batch_size, self.n_agents, -1)
+
+def load_state_dict(checkpoint, device='cpu'):
+    # Zip checkpoints are memory-mapped: tensors are read lazily from the page cache, which every
+    # process mapping the file shares. Legacy-format files cannot be mapped and are read whole.
+    try:
+        return torch.load(checkpoint, map_location=device, mmap=True, weights_only=True)
+    except RuntimeError:
+        return torch.load(checkpoint, map_location=device, weights_only=True)
+
+def load_model(checkpoint, n_agents, engine="dense", device='cpu'):
+    """
+    Load a checkpoint for `engine`: a .pth state dict into a GCN ("sparse") or DenseGCN
+    ("dense"), or a TorchScript policy ("frozen", exported from a .pth on first use).
+    """
+    if engine == "frozen" or checkpoint.endswith('.pt'):
+        return load_frozen_policy(checkpoint, n_agents, device) if checkpoint.endswith('.pth') else load_policy(checkpoint, device)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {list(ENGINES)}")
+
+    state_dict = load_state_dict(checkpoint, device)
+    weight = state_dict['conv1.lin.weight']
+    dims = (weight.shape[1], weight.shape[0], state_dict['lin2.weight'].shape[0])
+    # Built without storage or random initialization, the checkpoint tensors are assigned as they are
+    with torch.device('meta'):
+        if engine == "sparse":
+            from gcn import GCN
+            model = GCN(*dims)
+        else:
+            model = DenseGCN(*dims)
+    model.load_state_dict(state_dict, assign=True)
+    return model.eval()
+
+class PolicyRegistry:
+    """
+    In-process LRU cache of the policies loaded from checkpoint files.
+
+    Policies are keyed by the checkpoint's real path and agent count, together with the engine,
+    device and graph / precision options, and reloaded when the file has been modified since.
+    Only the `capacity` most recently used stay referenced by the registry.
+    """
+
+    def __init__(self, capacity=8):
+        self.capacity = capacity
+        self.policies = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, checkpoint, n_agents, engine="dense", device='cpu', topology="full", k=None, radius=None, precision="float32"):
+        path = os.path.realpath(checkpoint)
+        key = (path, n_agents, engine, str(device), topology, k, radius, precision)
+        modified = os.path.getmtime(path)
+        with self.lock:
+            if key in self.policies and self.policies[key][0] == modified:
+                self.policies.move_to_end(key)
+                self.hits += 1
+                return self.policies[key][1]
+            self.misses += 1
+            policy = Policy(load_model(path, n_agents, engine, device), n_agents, engine, topology, k, radius, precision)
+            self.policies[key] = (modified, policy)
+            self.policies.move_to_end(key)
+            while len(self.policies) > self.capacity:
+                self.policies.popitem(last=False)
+        return policy
+
+    def clear(self):
+        with self.lock:
+            self.policies.clear()
+
+    def __len__(self):
+        return len(self.policies)
+
+registry = PolicyRegistry()
+
+def get_policy(checkpoint, n_agents, **kwargs):
+    """
+    The Policy of a checkpoint for n_agents agents from the process-wide registry, loading it
+    on first use. kwargs are the PolicyRegistry.get options.
+    """
+    return registry.get(checkpoint, n_agents, **kwargs)
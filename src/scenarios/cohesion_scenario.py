@@ -2,7 +2,21 @@ import torch
 from vmas.simulator.core import Agent, World
 from vmas.simulator.scenario import BaseScenario
 from vmas.simulator.utils import Color
-import numpy as np
+from distance_cache import DistanceCache
+from formations import grid_formation
+import math
+
+LEGACY_NINE_AGENTS_POSITIONS = torch.tensor([
+    [-1.0, -1.0], 
+    [0.0, -1.0],  
+    [0.0, 1.0], 
+    [0.0, 0.0],   
+    [1.0, 1.0],
+    [1.0, -1.0], 
+    [-1.0, 1.0], 
+    [1.0, 0.0],  
+    [-1.0, 0.0],
+], dtype=torch.float32)
 
 class CohesionScenario(BaseScenario):
 
@@ -38,49 +52,58 @@ class CohesionScenario(BaseScenario):
         self.pos_rew = torch.zeros(batch_dim, device=device)
         self.final_rew = self.pos_rew.clone()
 
+        self.distances = DistanceCache(world.agents)
+
         return world
 
 
     def reset_world_at(self, env_index: int = None):
+        batch_size = self.world.batch_dim if env_index is None else 1
+
+        if self.n_agents == 9:
+            # Layout the cohesion_collision checkpoint was trained with
+            all__agents_positions = LEGACY_NINE_AGENTS_POSITIONS.to(self.world.device).repeat(batch_size, 1, 1)
+        else:
+            # Grid spanning the whole world, one corner at (-1, -1) and the opposite at (1, 1)
+            num_cols = math.ceil(math.sqrt(self.n_agents))
+            distance = 2 * self.world_semidim / max(num_cols - 1, 1)
+            all__agents_positions = grid_formation(torch.zeros(batch_size, 2, device=self.world.device), self.n_agents, distance)
 
-        all__agents_positions = torch.tensor([
-            [-1.0, -1.0], 
-            [0.0, -1.0],  
-            [0.0, 1.0], 
-            [0.0, 0.0],   
-            [1.0, 1.0],
-            [1.0, -1.0], 
-            [-1.0, 1.0], 
-            [1.0, 0.0],  
-            [-1.0, 0.0],
-        ], device='cpu', dtype=torch.float32)
+        if env_index is not None:
+            all__agents_positions = all__agents_positions[0]
 
         # Set the agents positions
         for i, agent in enumerate(self.world.agents):
 
             agent.set_pos(
-                all__agents_positions[i],
+                all__agents_positions[..., i, :],
                 batch_index=env_index,
             )
 
+        self.distances.invalidate()
+
+    def process_action(self, agent: Agent):
+        # Called for every agent right before the world steps
+        self.distances.invalidate()
+
     def reward(self, agent):
         distances = self.computeDistancesFromAgents(agent)
 
-        min_distance = torch.min(distances)
-        max_distance = torch.max(distances)
+        min_distance = torch.min(distances, dim=-1)[0]
+        max_distance = torch.max(distances, dim=-1)[0]
 
         #print(agent.name, " min: ", min_distance, " max: ", max_distance)
 
         return self.collision_factor(min_distance) + self.cohesion_factor(min_distance, max_distance)
 
     def computeDistancesFromAgents(self, agent: Agent):
-        return torch.cat([self.world.get_distance(agent, other_agent) for other_agent in self.world.agents if agent.name != other_agent.name])
+        return self.distances.surface_distances(agent)
     
     def collision_factor(self, min_distance):
-        return 0 if min_distance > self.sigma else np.exp(-(min_distance/self.sigma))
+        return torch.where(min_distance > self.sigma, 0, torch.exp(-(min_distance/self.sigma)))
     
     def cohesion_factor(self, min_distance, max_distance):
-        return 0 if min_distance < self.sigma else -(max_distance-self.sigma)
+        return torch.where(min_distance < self.sigma, 0, -(max_distance-self.sigma))
 
     def observation(self, agent: Agent):
         return torch.cat(
@@ -0,0 +1,105 @@
+import torch
+from vmas.simulator.core import Sphere
+from spatial_hash import SpatialHash
+
+class DistanceCache:
+    """
+    Per-step cache of agent-to-agent and agent-to-obstacle distances.
+
+    Every quantity is computed for all agents at once from the stacked [B, N, 2] agent positions,
+    the first time a reward term asks for it in a step, and reused until invalidate() is called
+    (scenarios do that when the world steps or is reset). Values match torch.linalg.vector_norm
+    and World.get_distance on the same pairs, so rewards are unchanged.
+
+    Collision counts switch to a SpatialHash broadphase from `broadphase_min_agents` agents on,
+    so they only test the pairs that can actually be within the collision distance.
+    """
+
+    def __init__(self, agents, obstacles=(), world_semidim=1, broadphase_min_agents=128):
+        for entity in list(agents) + list(obstacles):
+            assert isinstance(entity.shape, Sphere), f"{entity.name}: only sphere shapes are supported"
+        self.agents = list(agents)
+        self.obstacles = list(obstacles)
+        self.world_semidim = world_semidim
+        self.broadphase_min_agents = broadphase_min_agents
+        self.index = {agent.name: i for i, agent in enumerate(self.agents)}
+        self.cached = {}
+
+    def invalidate(self):
+        self.cached = {}
+
+    def _get(self, key, compute):
+        if key not in self.cached:
+            self.cached[key] = compute()
+        return self.cached[key]
+
+    def positions(self):
+        return self._get('positions', lambda: torch.stack([agent.state.pos for agent in self.agents], dim=1))
+
+    def radii(self):
+        return self._get('radii', lambda: torch.tensor([agent.shape.radius for agent in self.agents], device=self.positions().device))
+
+    def _others(self, matrix):
+        # Drop the diagonal, keeping the other agents in world order: [B, N, N] -> [B, N, N - 1]
+        n_agents = len(self.agents)
+        others = ~torch.eye(n_agents, dtype=torch.bool, device=matrix.device)
+        return matrix[:, others].view(-1, n_agents, n_agents - 1)
+
+    def _center(self):
+        # [B, N, N] distances between agent centers, same arithmetic as the per-pair vector_norm
+        positions = self.positions()
+        return torch.linalg.vector_norm(positions.unsqueeze(2) - positions.unsqueeze(1), dim=-1)
+
+    def _surface(self):
+        # Distance between agent surfaces, as World.get_distance computes it for two spheres
+        radii = self.radii()
+        return self.center_distances() - radii.view(1, -1, 1) - radii.view(1, 1, -1)
+
+    def _obstacle_surface(self):
+        positions = self.positions()
+        obstacle_positions = torch.stack([obstacle.state.pos for obstacle in self.obstacles], dim=1)
+        obstacle_radii = torch.tensor([obstacle.shape.radius for obstacle in self.obstacles], device=positions.device)
+        obstacle_center = torch.linalg.vector_norm(positions.unsqueeze(2) - obstacle_positions.unsqueeze(1), dim=-1)
+        return obstacle_center - self.radii().view(1, -1, 1) - obstacle_radii.view(1, 1, -1)
+
+    def _collision_counts(self, threshold):
+        if len(self.agents) < self.broadphase_min_agents:
+            return (self.surface_distances_to_others() <= threshold).sum(-1)
+
+        # Two spheres can only be within `threshold` if their centers are within threshold + both radii
+        radii = self.radii()
+        positions = self.positions()
+        broadphase = SpatialHash(threshold + 2 * radii.max().item(), self.world_semidim)
+        env, first, second = broadphase.candidate_pairs(positions)
+        surface = torch.linalg.vector_norm(positions[env, first] - positions[env, second], dim=-1) - radii[first] - radii[second]
+        colliding = surface <= threshold
+
+        counts = torch.zeros(positions.shape[:2], dtype=torch.long, device=positions.device)
+        return counts.index_put_((env[colliding], first[colliding]), torch.ones_like(env[colliding]), accumulate=True)
+
+    def center_distances(self, agent=None):
+        # [B, N, N] for all agents, or [B, N - 1] from `agent` to every other agent
+        center = self._get('center', self._center)
+        if agent is None:
+            return center
+        return self._get('center_to_others', lambda: self._others(center))[:, self.index[agent.name]]
+
+    def surface_distances(self, agent=None):
+        surface = self._get('surface', self._surface)
+        if agent is None:
+            return surface
+        return self.surface_distances_to_others()[:, self.index[agent.name]]
+
+    def surface_distances_to_others(self):
+        return self._get('surface_to_others', lambda: self._others(self.surface_distances()))
+
+    def obstacle_distances(self, agent=None):
+        # [B, N, L] for all agents, or [B, L] from `agent` to every obstacle
+        obstacle_surface = self._get('obstacle_surface', self._obstacle_surface)
+        if agent is None:
+            return obstacle_surface
+        return obstacle_surface[:, self.index[agent.name]]
+
+    def collisions(self, agent, threshold):
+        # [B] number of other agents whose surface is within `threshold` of `agent`'s
+        return self._get(('collisions', threshold), lambda: self._collision_counts(threshold))[:, self.index[agent.name]]
@@ -0,0 +1,95 @@
+import math
+import torch
+
+def random_centers(batch_size: int, position_range, device):
+    """
+    Draw one random formation center per environment, uniformly in position_range x position_range.
+
+    Returns:
+    torch.Tensor: [batch_size, 2] centers.
+    """
+    low, high = position_range
+    return (high - low) * torch.rand((batch_size, 2), device=device, dtype=torch.float32) + low
+
+def grid_offsets(num_points: int, distance: float, device=None):
+    """
+    Offsets of a grid of num_points positions around (0, 0), filled row by row.
+
+    Parameters:
+    num_points (int): The total number of points (agents) in the grid.
+    distance (float): The distance between each position in the grid.
+
+    Returns:
+    torch.Tensor: [num_points, 2] offsets.
+    """
+    num_cols = math.ceil(math.sqrt(num_points))
+    num_rows = math.ceil(num_points / num_cols)
+
+    # Offsets are computed in float64 like the Python floats of the original loop, then rounded once
+    cols = torch.arange(num_cols, device=device, dtype=torch.float64).repeat(num_rows)[:num_points]
+    rows = torch.arange(num_rows, device=device, dtype=torch.float64).repeat_interleave(num_cols)[:num_points]
+    x = (cols - (num_cols - 1) / 2) * distance
+    y = (rows - (num_rows - 1) / 2) * distance
+    return torch.stack([x, y], dim=-1).float()
+
+def grid_formation(centers: torch.Tensor, num_points: int, distance: float):
+    """
+    Generate a grid of positions around each center point.
+
+    Parameters:
+    centers (torch.Tensor): [B, 2] coordinates of the center of each environment's grid.
+    num_points (int): The total number of points (agents) in the grid.
+    distance (float): The distance between each position in the grid.
+
+    Returns:
+    torch.Tensor: [B, num_points, 2] positions.
+    """
+    return centers.unsqueeze(1) + grid_offsets(num_points, distance, centers.device)
+
+def line_formation(centers: torch.Tensor, num_points: int, distance: float):
+    """
+    Generate a horizontal line of positions centered on each center point.
+
+    Returns:
+    torch.Tensor: [B, num_points, 2] positions.
+    """
+    x = (torch.arange(num_points, device=centers.device, dtype=torch.float64) - (num_points - 1) / 2) * distance
+    offsets = torch.stack([x, torch.zeros_like(x)], dim=-1).float()
+    return centers.unsqueeze(1) + offsets
+
+def disc_formation(centers: torch.Tensor, num_points: int, distance: float):
+    """
+    Scatter positions uniformly at random in a disc around each center point.
+
+    The disc radius grows with sqrt(num_points), so the density roughly matches a grid with
+    the same spacing.
+
+    Returns:
+    torch.Tensor: [B, num_points, 2] positions.
+    """
+    radius = distance * math.sqrt(num_points)
+    shape = (centers.shape[0], num_points)
+    r = radius * torch.sqrt(torch.rand(shape, device=centers.device))
+    theta = 2 * math.pi * torch.rand(shape, device=centers.device)
+    return centers.unsqueeze(1) + torch.stack([r * torch.cos(theta), r * torch.sin(theta)], dim=-1)
+
+FORMATIONS = {
+    "grid": grid_formation,
+    "line": line_formation,
+    "disc": disc_formation,
+}
+
+def formation(name: str, centers: torch.Tensor, num_points: int, distance: float):
+    if name not in FORMATIONS:
+        raise ValueError(f"Unknown formation '{name}', expected one of {list(FORMATIONS)}")
+    return FORMATIONS[name](centers, num_points, distance)
+
+def assign_at(current, new: torch.Tensor, env_index):
+    """
+    Update per-environment state on reset: replace it entirely when every environment is
+    reset (env_index is None), otherwise only overwrite the row of the environment being reset.
+    """
+    if env_index is None:
+        return new
+    current[env_index] = new[env_index]
+    return current
@@ -1,8 +1,9 @@
 import torch
-import math
 from vmas.simulator.core import Agent, Landmark, World
 from vmas.simulator.scenario import BaseScenario
 from vmas.simulator.utils import Color
+from formations import formation, assign_at
+from distance_cache import DistanceCache
 
 class ObstacleAvoidanceScenario(BaseScenario):
 
@@ -11,6 +12,7 @@ class ObstacleAvoidanceScenario(BaseScenario):
         self.dist_shaping_factor = kwargs.get("dist_shaping_factor", 10.0)
         self.agent_radius = kwargs.get("agent_radius", 0.1)
         self.n_agents = kwargs.get("n_agents", 1)
+        self.formation = kwargs.get("formation", "grid")
 
         self.min_distance_between_entities = self.agent_radius * 2 + 0.05
         self.world_semidim = 1
@@ -50,84 +52,57 @@ class ObstacleAvoidanceScenario(BaseScenario):
             )
             agent.pos_rew = torch.zeros(batch_dim, device=device)
             agent.collision_rew = agent.pos_rew.clone()
+            agent.previous_distance_to_goal = agent.pos_rew.clone()
+            agent.previous_distance_to_agents = agent.pos_rew.clone()
             agent.goal = goal
             world.add_agent(agent)
 
         self.pos_rew = torch.zeros(batch_dim, device=device)
         self.final_rew = self.pos_rew.clone()
 
+        self.distances = DistanceCache(world.agents, world.landmarks[1:self.n_obstacles + 1], world_semidim=self.world_semidim)
+
         return world
     
-    def generate_grid(self, center: torch.Tensor, num_points: int, distance: float):
-        """
-        Generate a grid of positions around a center point.
-
-        Parameters:
-        center (torch.Tensor): Coordinates of the center point (x, y).
-        num_points (int): The total number of points (agents) in the grid.
-        distance (float): The distance between each position in the grid.
-
-        Returns:
-        torch.Tensor: A tensor containing the positions in the grid.
-        """
-        x_center, y_center = center
-
-        num_cols = math.ceil(math.sqrt(num_points))
-        num_rows = math.ceil(num_points / num_cols)
-
-        grid = []
-        for i in range(num_rows):
-            for j in range(num_cols):
-                x = x_center + (j - (num_cols - 1) / 2) * distance
-                y = y_center + (i - (num_rows - 1) / 2) * distance
-                grid.append([x, y])
-                if len(grid) >= num_points:
-                    break
-            if len(grid) >= num_points:
-                break
-        
-        return torch.tensor(grid)
-
-
     def reset_world_at(self, env_index: int = None):
         self.world.obstacle_hits = 0
+        batch_size = self.world.batch_dim if env_index is None else 1
 
         self.world.landmarks[0].set_pos(torch.tensor([-0.8, 0.8]), batch_index=env_index)
 
         self.world.landmarks[1].set_pos(torch.tensor([-0.1, 0.1]), batch_index=env_index)
 
-        central_position = torch.tensor([0.6, -0.6])
+        central_position = torch.tensor([[0.6, -0.6]], device=self.world.device).expand(batch_size, 2)
 
-        all__agents_positions = self.generate_grid(central_position, self.n_agents, self.desired_distance)
+        all__agents_positions = formation(self.formation, central_position, self.n_agents, self.desired_distance)
+        if env_index is not None:
+            all__agents_positions = all__agents_positions[0]
 
         for i, agent in enumerate(self.world.agents):
 
             agent.set_pos(
-                all__agents_positions[i],
+                all__agents_positions[..., i, :],
                 batch_index=env_index,
             )
 
-            agent.previous_distance_to_goal = (
+        self.distances.invalidate()
+
+        for agent in self.world.agents:
+
+            previous_distance_to_goal = (
                 torch.linalg.vector_norm(
                     agent.state.pos - agent.goal.state.pos,
                     dim=1,
                 )
                 * self.pos_shaping_factor
             )
+            agent.previous_distance_to_goal = assign_at(agent.previous_distance_to_goal, previous_distance_to_goal, env_index)
 
-            agent.previous_distance_to_agents = (
-                torch.stack(
-                    [
-                        torch.linalg.vector_norm(
-                            agent.state.pos - a.state.pos, dim=-1
-                        )
-                        for a in self.world.agents
-                        if a != agent
-                    ],
-                    dim=1,
-                )
-                - self.desired_distance
-            ).pow(2).mean(-1) * self.dist_shaping_factor
+            agent.previous_distance_to_agents = assign_at(agent.previous_distance_to_agents, self.shaped_distance_to_agents(agent), env_index)
+
+    def process_action(self, agent: Agent):
+        # Called for every agent right before the world steps
+        self.distances.invalidate()
 
     def reward(self, agent):
         if agent == self.world.agents[0]:
@@ -151,23 +126,17 @@ class ObstacleAvoidanceScenario(BaseScenario):
 
         reward = agent.pos_rew
 
-        if agent.on_goal:
-            reward = reward + 50
+        reward = torch.where(agent.on_goal, reward + 50, reward)
 
         return reward 
     
-    def distance_to_agents_reward(self, agent: Agent):
-        distance_to_agents = (
-            torch.stack(
-                [
-                    torch.linalg.vector_norm(agent.state.pos - a.state.pos, dim=-1)
-                    for a in self.world.agents
-                    if a != agent
-                ],
-                dim=1,
-            )
-            - self.desired_distance
+    def shaped_distance_to_agents(self, agent: Agent):
+        return (
+            self.distances.center_distances(agent) - self.desired_distance
         ).pow(2).mean(-1) * self.dist_shaping_factor
+
+    def distance_to_agents_reward(self, agent: Agent):
+        distance_to_agents = self.shaped_distance_to_agents(agent)
         agent.dist_rew = agent.previous_distance_to_agents - distance_to_agents
         agent.previous_distance_to_agents = distance_to_agents
 
@@ -175,20 +144,15 @@ class ObstacleAvoidanceScenario(BaseScenario):
     
     def agent_avoidance_reward(self, agent: Agent):
 
-        reward = sum(
-            self.agent_collision_reward for other_agent in self.world.agents
-            if agent.name != other_agent.name and self.world.get_distance(agent, other_agent) <= self.min_collision_distance
-        )
+        collisions = self.distances.collisions(agent, self.min_collision_distance)
 
-        return reward
+        return self.agent_collision_reward * collisions
     
     def obstacle_avoidance_reward(self, agent: Agent):
 
-        for i in range (1, self.n_obstacles + 1):
-            if self.world.get_distance(agent, self.world.landmarks[i]) <= self.min_collision_distance :
-                return self.obstacle_collision_reward
+        hit = (self.distances.obstacle_distances(agent) <= self.min_collision_distance).any(-1)
 
-        return 0
+        return self.obstacle_collision_reward * hit
 
     def observation(self, agent: Agent):
         return torch.cat(
@@ -0,0 +1,57 @@
+import math
+import torch
+
+class SpatialHash:
+    """
+    Uniform-grid broadphase over the square world [-world_semidim, world_semidim]^2.
+
+    Every agent of every batched environment is hashed to a cell of side `cell_size` with one
+    sort, and each agent is paired only with the agents in its own and the 8 neighbouring cells
+    of the same environment. Any two agents whose centers are closer than `cell_size` are
+    guaranteed to be among the candidate pairs, so callers test exact distances on O(N) pairs
+    instead of all O(N^2). Agents outside the world are clamped to the border cells, which can
+    only add candidates, never drop them.
+    """
+
+    def __init__(self, cell_size: float, world_semidim: float):
+        self.cell_size = cell_size
+        self.world_semidim = world_semidim
+        self.grid_dim = max(1, math.ceil(2 * world_semidim / cell_size))
+        self.neighbour_offsets = torch.tensor([[dx, dy] for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+
+    def cells(self, positions: torch.Tensor):
+        # positions: [B, N, 2] -> [B, N, 2] integer cell coordinates
+        cells = torch.floor((positions + self.world_semidim) / self.cell_size).long()
+        return cells.clamp_(0, self.grid_dim - 1)
+
+    def candidate_pairs(self, positions: torch.Tensor):
+        """
+        Return (env, i, j) index tensors of the ordered agent pairs (i != j) sharing a cell
+        neighbourhood in the same environment.
+        """
+        batch_size, n_agents, _ = positions.shape
+        device = positions.device
+        cells = self.cells(positions)
+
+        env = torch.arange(batch_size, device=device).repeat_interleave(n_agents)
+        keys = (env * self.grid_dim + cells[..., 0].reshape(-1)) * self.grid_dim + cells[..., 1].reshape(-1)
+        sorted_keys, order = torch.sort(keys)
+
+        # [B * N, 9] neighbour cells of every agent; cells off the grid match nothing
+        neighbours = cells.reshape(-1, 1, 2) + self.neighbour_offsets.to(device)
+        inside = ((neighbours >= 0) & (neighbours < self.grid_dim)).all(dim=-1)
+        neighbour_keys = (env.unsqueeze(1) * self.grid_dim + neighbours[..., 0]) * self.grid_dim + neighbours[..., 1]
+        start = torch.searchsorted(sorted_keys, neighbour_keys)
+        counts = (torch.searchsorted(sorted_keys, neighbour_keys, right=True) - start) * inside
+
+        # Expand every (agent, neighbour cell) range into one candidate per agent in that cell
+        counts = counts.reshape(-1)
+        queries = torch.arange(batch_size * n_agents, device=device).repeat_interleave(9)
+        range_starts = torch.repeat_interleave(start.reshape(-1), counts)
+        within_range = torch.arange(counts.sum().item(), device=device) - torch.repeat_interleave(torch.cumsum(counts, 0) - counts, counts)
+        first = torch.repeat_interleave(queries, counts)
+        second = order[range_starts + within_range]
+
+        distinct = first != second
+        first, second = first[distinct], second[distinct]
+        return first // n_agents, first % n_agents, second % n_agents
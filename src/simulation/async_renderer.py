@@ -0,0 +1,122 @@
+import os
+import queue
+import multiprocessing as mp
+import torch
+from vmas import make_env
+
+def snapshot_world(world, env_index=0):
+    """
+    Copy the state rendering depends on out of one environment of a batched world.
+
+    Returns:
+    np.ndarray: [n_entities, 5] rows of (x, y, rotation, force x, force y), in world.entities order.
+    """
+    rows = []
+    for entity in world.entities:
+        force = getattr(entity.state, 'force', None)
+        force = force[env_index] if force is not None else torch.zeros(2, device=world.device)
+        rows.append(torch.cat([entity.state.pos[env_index], entity.state.rot[env_index], force]))
+    return torch.stack(rows).cpu().numpy()
+
+def restore_world(world, snapshot):
+    for entity, row in zip(world.entities, torch.from_numpy(snapshot)):
+        entity.set_pos(row[:2].unsqueeze(0), batch_index=None)
+        entity.set_rot(row[2:3].unsqueeze(0), batch_index=None)
+        if getattr(entity.state, 'force', None) is not None:
+            entity.state.force = row[3:].unsqueeze(0)
+
+def encode(path, frames, fps):
+    if path.endswith('.gif'):
+        from PIL import Image
+        images = [Image.fromarray(frame) for frame in frames]
+        images[0].save(path, save_all=True, append_images=images[1:], duration=int(1000 / fps), loop=0)
+    elif path.endswith('.mp4'):
+        # Requires cv2, like vmas.simulator.utils.save_video which writes <name>.mp4
+        from vmas.simulator.utils import save_video
+        save_video(path[:-len('.mp4')], frames, fps)
+    else:
+        raise ValueError(f"Unsupported video format '{path}', expected a .gif or .mp4 file")
+
+def _render_worker(scenario_class, scenario_kwargs, snapshots, output, fps, scale, visualize):
+    torch.set_num_threads(1)
+    env = make_env(scenario=scenario_class(), num_envs=1, device="cpu", continuous_actions=False, **scenario_kwargs)
+    env.reset()
+    width, height = env.scenario.viewer_size
+    env.scenario.viewer_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    fps = fps if fps is not None else 1 / env.world.dt
+
+    frames = []
+    episode = 0
+    while True:
+        message = snapshots.get()
+        if message is None or isinstance(message, str):
+            if output is not None and frames:
+                encode(output.format(episode=episode), frames, fps)
+            frames = []
+            episode += 1
+            if message is None:
+                break
+            continue
+
+        restore_world(env.world, message)
+        frame = env.render(mode="rgb_array", agent_index_focus=None, visualize_when_rgb=visualize)
+        if output is not None:
+            frames.append(frame)
+    if env.viewer is not None:
+        env.viewer.close()
+
+class AsyncRenderer:
+    """
+    Render an environment in a background process from world-state snapshots.
+
+    submit() copies the positions, rotations and forces of one environment (a few floats per
+    entity) into a bounded queue and returns immediately; snapshots are dropped rather than
+    blocking the caller when the renderer falls behind. The worker process owns its own
+    single-env copy of the scenario, restores each snapshot into it and renders it with pyglet,
+    optionally on screen (`visualize`) and/or encoded per episode to `output`, a .gif or .mp4
+    path that may contain an {episode} placeholder.
+
+    Only every `every`-th submitted step is rendered, at `scale` times the scenario's viewer
+    size. Callers that do not render simply keep no renderer (None), which costs nothing.
+    """
+
+    def __init__(self, env, scenario_kwargs=None, every=1, scale=1.0, output=None, fps=None, visualize=False, queue_size=64, env_index=0):
+        self.env = env
+        self.every = every
+        self.env_index = env_index
+        self.steps = 0
+        self.dropped = 0
+        if output is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+            # Decimated frames are played back at the simulation rate by default
+            fps = fps if fps is not None else 1 / (env.world.dt * every)
+
+        scenario_kwargs = dict(scenario_kwargs or {})
+        scenario_kwargs.setdefault('n_agents', env.n_agents)
+        context = mp.get_context('spawn')
+        self.snapshots = context.Queue(maxsize=queue_size)
+        self.process = context.Process(
+            target=_render_worker,
+            args=(type(env.scenario), scenario_kwargs, self.snapshots, output, fps, scale, visualize),
+            daemon=True,
+        )
+        self.process.start()
+
+    def submit(self):
+        self.steps += 1
+        if (self.steps - 1) % self.every != 0:
+            return
+        try:
+            self.snapshots.put_nowait(snapshot_world(self.env.world, self.env_index))
+        except queue.Full:
+            self.dropped += 1
+
+    def end_episode(self):
+        # Control messages block so episode boundaries are never dropped
+        self.steps = 0
+        self.snapshots.put('end_episode')
+
+    def close(self):
+        if self.process.is_alive():
+            self.snapshots.put(None)
+        self.process.join()
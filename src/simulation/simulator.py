@@ -1,66 +1,127 @@
+import sys
+import os
+inference_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'inference'))
+training_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'training'))
+sys.path.insert(0, inference_dir)
+sys.path.insert(1, training_dir)
 import torch
-from train_gcn_dqn import DQNTrainer
+from policy_loader import Policy, get_policy
+from stacked_env import StackedEnv
 import time
 import csv
 
 class Simulator:
-    def __init__(self, env, model):
-        self.env = env
-        self.model = model
-        self.trainer = DQNTrainer(self.env)
+    def __init__(self, env, model, engine="sparse", topology="full", k=None, radius=None, renderer=None, precision="float32"):
+        """
+        model is a Policy, a model (GCN, DenseGCN or a frozen TorchScript export) or the path of
+        a checkpoint, loaded through the policy registry of src/inference (see get_policy).
+        """
+        self.env = env if isinstance(env, StackedEnv) else StackedEnv(env)
+        # Optional AsyncRenderer, without one the simulation runs headless
+        self.renderer = renderer
+        if isinstance(model, Policy):
+            self.policy = model
+        elif isinstance(model, str):
+            self.policy = get_policy(model, self.env.n_agents, engine=engine, device=self.env.device, topology=topology, k=k, radius=radius, precision=precision)
+        else:
+            self.policy = Policy(model, self.env.n_agents, engine=engine, topology=topology, k=k, radius=radius, precision=precision)
+        self.model = self.policy.model
         self.episode_rewards = []
         self.rewards_buffer = []
 
-    def run_simulation(self):
+    def select_actions(self, observations):
+        # observations: [B, N, F] -> [B, N] greedy actions
+        return self.policy(observations).argmax(dim=-1).view(self.env.num_envs, self.env.n_agents)
 
-        for episode in range(400):
-            total_episode_reward = torch.zeros(self.env.n_agents)
+    def run_simulation(self, episodes=400, stats_path='go_to_position_eval_5606.csv'):
+
+        for episode in range(episodes):
+            total_episode_reward = torch.zeros(self.env.num_envs, self.env.n_agents)
             observations = self.env.reset()
             init_time = time.time()
             total_reward = 0
 
             for _ in range(self.env.max_steps):
-                graph_data = self.trainer.create_graph_from_observations(observations)
+                actions = self.select_actions(observations)
 
-                with torch.no_grad():
-                    logits = self.model(graph_data)                    
-                    actions = torch.argmax(logits, dim=1)
-                
-                actions_dict = {f'agent{i}': torch.tensor([actions[i].item()]) for i in range(len(self.env.agents))}
-                
-                observations, rewards, _ , _ = self.env.step(actions_dict)
+                observations, rewards, _ , _ = self.env.step(actions)
 
-                rewards_tensor = torch.tensor([rewards[f'agent{i}'] for i in range(len(self.env.agents))], dtype=torch.float)
+                total_episode_reward += rewards
 
-                total_episode_reward += rewards_tensor
+                total_reward += rewards.sum()
 
-                total_reward += sum(rewards.values())
+                if self.renderer is not None:
+                    self.renderer.submit()
 
-                frame = self.env.render(
-                    mode="rgb_array",
-                    agent_index_focus=None,
-                    visualize_when_rgb=True,
-                )
+            if self.renderer is not None:
+                self.renderer.end_episode()
 
             total_time = time.time() - init_time
             print(
-                f"It took: {total_time}s for {self.env.max_steps} steps of episode {episode} with {total_reward} total reward, on device {self.env.device} "
+                f"It took: {total_time}s for {self.env.max_steps} steps of episode {episode} with {float(total_reward)} total reward, on device {self.env.device} "
                 f"for test_gcn_vmas scenario."
             )
 
-            self.rewards_buffer.append(total_episode_reward[0])
+            self.rewards_buffer.append(total_episode_reward[:, 0].mean())
             if (episode + 1) % 10 == 0:
                 mean_reward = sum(self.rewards_buffer) / 10
                 self.episode_rewards.append(mean_reward)
                 self.rewards_buffer = []
 
-        self.save_metrics_to_csv()
+        self.save_metrics_to_csv(stats_path)
+
+    def run_benchmark(self, episodes, warmup_episodes=1):
+        """
+        Run the policy greedily on every batched environment without rendering, timing policy
+        inference (graph building and forward pass) separately from env.step.
+
+        Parameters:
+        episodes (int): The number of timed episodes.
+        warmup_episodes (int): Untimed episodes run first.
+
+        Returns:
+        dict: Step counts, throughput and the inference / env.step time split.
+        """
+        inference_time = 0
+        step_time = 0
+        steps = 0
+
+        for episode in range(warmup_episodes + episodes):
+            timed = episode >= warmup_episodes
+            observations = self.env.reset()
+
+            for _ in range(self.env.max_steps):
+                init_time = time.perf_counter()
+                actions = self.select_actions(observations)
+                step_start = time.perf_counter()
+                observations, _, _, _ = self.env.step(actions)
+                end_time = time.perf_counter()
+
+                if timed:
+                    inference_time += step_start - init_time
+                    step_time += end_time - step_start
+                    steps += 1
+
+        total_time = inference_time + step_time
+        env_steps = steps * self.env.num_envs
+        return {
+            'episodes': episodes,
+            'num_envs': self.env.num_envs,
+            'n_agents': self.env.n_agents,
+            'max_steps': self.env.max_steps,
+            'env_steps': env_steps,
+            'total_time_s': total_time,
+            'steps_per_sec': env_steps / total_time,
+            'agent_steps_per_sec': env_steps * self.env.n_agents / total_time,
+            'inference_time_s': inference_time,
+            'env_step_time_s': step_time,
+            'inference_fraction': inference_time / total_time,
+        }
 
-    def save_metrics_to_csv(self):
-        with open('go_to_position_eval_5606.csv', mode='w', newline='') as file:
+    def save_metrics_to_csv(self, path='go_to_position_eval_5606.csv'):
+        with open(path, mode='w', newline='') as file:
             writer = csv.writer(file)
             writer.writerow(['Episode', 'Reward'])
-            for i in range(400):
-                if (i + 1) % 10 == 0:
-                    writer.writerow([i, self.episode_rewards[i // 10].item()])
+            for i, reward in enumerate(self.episode_rewards):
+                writer.writerow([(i + 1) * 10 - 1, reward.item()])
 
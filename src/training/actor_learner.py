@@ -0,0 +1,271 @@
+import sys
+import os
+scenarios_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scenarios'))
+sys.path.insert(0, scenarios_dir)
+import argparse
+import copy
+import queue
+import time
+import torch
+import torch.multiprocessing as mp
+from torch.nn.utils import parameters_to_vector, vector_to_parameters
+from vmas import make_env
+from obstacle_avoidance_scenario import ObstacleAvoidanceScenario
+from train_gcn_dqn import DQNTrainer, set_seed
+from replay_buffer import SharedGraphReplayBuffer, NStepAccumulator
+from stacked_env import StackedEnv
+
+def actor_epsilons(n_actors, epsilon=0.4, alpha=7):
+    # Ape-X schedule: actor i explores with epsilon ** (1 + alpha * i / (n_actors - 1))
+    if n_actors == 1:
+        return [epsilon]
+    return [epsilon ** (1 + alpha * i / (n_actors - 1)) for i in range(n_actors)]
+
+class SharedWeights:
+    """
+    Policy weights published by the learner and pulled by the actors through shared memory.
+
+    The parameters are kept as one flat vector next to a version counter, both shared tensors,
+    so an actor only copies the weights when the learner has published a newer version.
+    """
+
+    def __init__(self, model, lock):
+        self.vector = parameters_to_vector(model.parameters()).detach().clone().share_memory_()
+        self.version = torch.zeros(1, dtype=torch.long).share_memory_()
+        self.lock = lock
+
+    def publish(self, model):
+        with self.lock:
+            self.vector.copy_(parameters_to_vector(model.parameters()).detach())
+            self.version += 1
+
+    def pull(self, model, version=-1):
+        """
+        Load the published weights into model unless they are still at `version`.
+
+        Returns:
+        int: The version model now holds.
+        """
+        with self.lock:
+            published = int(self.version)
+            if published != version:
+                vector_to_parameters(self.vector.clone(), model.parameters())
+        return published
+
+def run_actor(actor_id, config, replay_buffer, weights, stop, reports):
+    """
+    Collect transitions into the shared replay buffer with a fixed epsilon until `stop` is set,
+    refreshing the policy from `weights` after every episode. Each finished episode is reported
+    as (actor_id, mean total reward of agent 0, epsilon).
+    """
+    torch.set_num_threads(config['threads'])
+    set_seed(config['seed'])
+    env = StackedEnv(make_env(
+        scenario=config['scenario'](),
+        num_envs=config['num_envs'],
+        device="cpu",
+        continuous_actions=False,
+        wrapper=None,
+        max_steps=config['max_steps'],
+        dict_spaces=True,
+        n_agents=config['n_agents'],
+        seed=config['seed'],
+    ))
+    graph_builder = replay_buffer.graph_builder
+    model = config['model']
+    model.eval()
+    version = weights.pull(model)
+    epsilon = config['epsilon']
+    n_step = NStepAccumulator(config['n_step'], config['gamma'])
+
+    while not stop.is_set():
+        observations = env.reset()
+        graph_data = graph_builder.build(observations)
+        total_episode_reward = torch.zeros(env.num_envs, env.n_agents)
+        for _ in range(env.max_steps):
+            with torch.no_grad(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=config['precision'] == "bfloat16"):
+                logits = model(graph_data)
+            actions = env.explore(logits.argmax(dim=1).view(env.num_envs, env.n_agents), epsilon)
+            observations, rewards, dones, _ = env.step(actions)
+            next_graph_data = graph_builder.build(observations)
+            transitions = n_step.push(graph_builder.node_features(graph_data), actions, rewards.float(), graph_builder.node_features(next_graph_data), env.terminated(dones))
+            if transitions is not None:
+                replay_buffer.push(*transitions)
+            total_episode_reward += rewards
+            graph_data = next_graph_data
+            if stop.is_set():
+                return
+        transitions = n_step.flush()
+        if transitions is not None:
+            replay_buffer.push(*transitions)
+        reports.put((actor_id, total_episode_reward[:, 0].mean().item(), epsilon))
+        version = weights.pull(model, version)
+
+class ActorLearnerTrainer(DQNTrainer):
+    """
+    DQN with collection and learning in separate processes.
+
+    n_actors spawned actor processes each run their own copy of the environment (actor_envs
+    batched worlds, one torch thread) with their own epsilon, and push transitions into a
+    SharedGraphReplayBuffer. The calling process is the learner: it runs train_step_dqn
+    back to back and publishes its weights through SharedWeights every `publish_every`
+    updates, so collection and gradient steps scale on separate cores. `env` is only used as
+    the template for the actors' environments and for evaluation.
+    """
+
+    def __init__(self, env, n_actors=2, actor_envs=None, actor_threads=1, **kwargs):
+        # Checked before DQNTrainer builds its replay buffer, which may create a memmap directory
+        if kwargs.get('prioritized_replay') or kwargs.get('replay_directory') is not None:
+            raise ValueError("The actor-learner trainer only supports the uniform in-memory replay buffer")
+        super(ActorLearnerTrainer, self).__init__(env, **kwargs)
+        self.n_actors = n_actors
+        self.actor_envs = actor_envs or self.env.num_envs
+        self.actor_threads = actor_threads
+        self.context = mp.get_context('spawn')
+        self.replay_buffer = SharedGraphReplayBuffer(
+            self.replay_buffer.capacity, self.graph_builder, self.env.n_agents, self.n_input, self.context.Lock(),
+        )
+        self.weights = SharedWeights(self.model, self.context.Lock())
+
+    def actor_config(self, actor_id, epsilon, seed):
+        return {
+            'scenario': type(self.env.scenario),
+            'num_envs': self.actor_envs,
+            'n_agents': self.env.n_agents,
+            'max_steps': self.env.max_steps,
+            'threads': self.actor_threads,
+            'seed': seed + actor_id,
+            'epsilon': epsilon,
+            'n_step': self.n_step.n_step,
+            'gamma': self.gamma,
+            'precision': self.precision,
+            'model': copy.deepcopy(self.model),
+        }
+
+    def train_model(self, config):
+        """
+        Train until the actors have finished config['episodes'] episodes in total.
+
+        Besides train_model's model_name and stats_path, config takes batch_size (128),
+        publish_every (50 updates), update_target_every (10 updates), seed (0), and either
+        epsilons (one per actor) or epsilon / epsilon_alpha for the Ape-X schedule.
+        """
+        model_name = config["model_name"]
+        episodes = config["episodes"]
+        batch_size = config.get("batch_size", 128)
+        publish_every = config.get("publish_every", 50)
+        update_target_every = config.get("update_target_every", 10)
+        epsilons = config.get("epsilons") or actor_epsilons(self.n_actors, config.get("epsilon", 0.4), config.get("epsilon_alpha", 7))
+        if len(epsilons) != self.n_actors:
+            raise ValueError(f"Got {len(epsilons)} epsilons for {self.n_actors} actors")
+
+        stop = self.context.Event()
+        reports = self.context.Queue()
+        actors = [
+            self.context.Process(
+                target=run_actor,
+                args=(actor_id, self.actor_config(actor_id, epsilons[actor_id], config.get("seed", 0)), self.replay_buffer, self.weights, stop, reports),
+                daemon=True,
+            )
+            for actor_id in range(self.n_actors)
+        ]
+        for actor in actors:
+            actor.start()
+
+        updates = 0
+        finished = 0
+        average_loss = 0.0
+        episode_loss = 0
+        episode_updates = 0
+        try:
+            while finished < episodes:
+                if len(self.replay_buffer) < batch_size:
+                    time.sleep(0.01)
+                else:
+                    updates += 1
+                    episode_loss += self.train_step_dqn(batch_size, self.model, self.target_model, updates, update_target_every=update_target_every)
+                    episode_updates += 1
+                    self.metrics.end_tick(updates)
+                    if updates % publish_every == 0:
+                        self.weights.publish(self.model)
+
+                while finished < episodes:
+                    try:
+                        actor_id, reward, epsilon = reports.get_nowait()
+                    except queue.Empty:
+                        break
+                    # Losses are averaged over the learner updates since the previous report, reports
+                    # arriving together share that average
+                    if episode_updates > 0:
+                        average_loss = float(episode_loss) / episode_updates
+                    self.record_episode(finished, actor_id, reward, average_loss, updates)
+                    print(f'Episode {finished} (actor {actor_id}, epsilon {epsilon:.4f}), Loss: {average_loss}, Reward: {reward}, Updates: {updates}')
+                    finished += 1
+                    episode_loss = 0
+                    episode_updates = 0
+
+                if not all(actor.is_alive() for actor in actors):
+                    raise RuntimeError(f"Actor process exited with code {[actor.exitcode for actor in actors if not actor.is_alive()]}")
+        finally:
+            stop.set()
+            # Drain reports so actors blocked on the queue can exit
+            while any(actor.is_alive() for actor in actors):
+                try:
+                    reports.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            for actor in actors:
+                actor.join()
+            self.metrics.close(updates)
+
+        print(f"Training completed after {updates} learner updates")
+        if self.timer.enabled:
+            print(self.timer.summary())
+        torch.save(self.model.state_dict(), model_name + '.pth')
+        print("Model saved successfully!")
+
+        self.save_metrics_to_csv(config.get("stats_path", 'obstacle_avoidance_stats_4842.csv'))
+
+    def record_episode(self, episode, actor_id, reward, average_loss, updates):
+        self.episode_losses.append(average_loss)
+        self.rewards_buffer.append(torch.tensor(reward))
+        self.metrics.add_scalar('Reward', reward, episode)
+        self.metrics.add_scalar(f'Actor{actor_id}/Reward', reward, episode)
+        self.metrics.add_scalar('Updates', updates, episode)
+        if (episode + 1) % 10 == 0:
+            self.episode_rewards.append(sum(self.rewards_buffer) / 10)
+            self.rewards_buffer = []
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Train the obstacle avoidance policy with parallel actors and one learner.")
+    parser.add_argument('--actors', type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument('--actor-envs', type=int, default=8, help="Batched environments per actor")
+    parser.add_argument('--episodes', type=int, default=800, help="Total episodes over all actors")
+    parser.add_argument('--learner-threads', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=4842)
+    args = parser.parse_args()
+
+    set_seed(args.seed)
+    torch.set_num_threads(args.learner_threads)
+
+    env = make_env(
+        scenario=ObstacleAvoidanceScenario(),
+        num_envs=args.actor_envs,
+        device="cpu",
+        continuous_actions=False,
+        wrapper=None,
+        max_steps=100,
+        dict_spaces=True,
+        n_agents=5,
+        seed=args.seed
+    )
+
+    config = {
+        'model_name': 'obstacle_model_5_actor_learner',
+        'episodes': args.episodes,
+        'seed': args.seed,
+    }
+
+    trainer = ActorLearnerTrainer(env, n_actors=args.actors)
+    trainer.train_model(config)
@@ -0,0 +1,106 @@
+import os
+import glob
+import queue
+import random
+import threading
+import torch
+
+def rng_state():
+    state = {'torch': torch.get_rng_state(), 'python': random.getstate()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+def set_rng_state(state):
+    torch.set_rng_state(state['torch'])
+    random.setstate(state['python'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+def checkpoint_path(directory, episode):
+    return os.path.join(directory, f'checkpoint_{episode:06d}.pt')
+
+def latest_checkpoint(path):
+    """
+    Resolve `path` to a checkpoint file: itself if it is one, else the newest checkpoint in
+    that directory.
+    """
+    if os.path.isfile(path):
+        return path
+    checkpoints = sorted(glob.glob(os.path.join(path, 'checkpoint_*.pt')))
+    if not checkpoints:
+        raise FileNotFoundError(f"No checkpoint found in {path}")
+    return checkpoints[-1]
+
+def load_checkpoint(path, device='cpu'):
+    # Checkpoints hold optimizer state, RNG states and Python objects besides tensors
+    return torch.load(latest_checkpoint(path), map_location=device, weights_only=False)
+
+class AsyncCheckpointer:
+    """
+    Write training checkpoints to `directory` from a background thread.
+
+    save() hands over a state whose tensors are already copies (see DQNTrainer.checkpoint_state)
+    and returns immediately; the thread serializes it with torch.save to a temporary file and
+    renames it to checkpoint_<episode>.pt, so a crash mid-write never leaves a truncated
+    checkpoint, then deletes all but the `keep` newest. At most one state waits for the thread:
+    when the disk falls behind a newer checkpoint replaces the waiting one (counted in
+    `skipped`) rather than blocking training or piling up copies in memory. A failed write is
+    raised on the next save() or on close().
+    """
+
+    def __init__(self, directory, keep=2):
+        self.directory = directory
+        self.keep = keep
+        self.skipped = 0
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+        self.pending = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+
+    def save(self, state):
+        self._raise_error()
+        try:
+            self.pending.put_nowait(state)
+        except queue.Full:
+            try:
+                self.pending.get_nowait()
+                self.pending.task_done()
+                self.skipped += 1
+            except queue.Empty:
+                pass
+            self.pending.put(state)
+
+    def _write(self):
+        while True:
+            state = self.pending.get()
+            if state is None:
+                self.pending.task_done()
+                break
+            try:
+                path = checkpoint_path(self.directory, state['episode'])
+                temporary = f'{path}.tmp'
+                torch.save(state, temporary)
+                os.replace(temporary, path)
+                for stale in sorted(glob.glob(os.path.join(self.directory, 'checkpoint_*.pt')))[:-self.keep]:
+                    os.remove(stale)
+            except Exception as error:
+                self.error = error
+            self.pending.task_done()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError(f"Writing a checkpoint to {self.directory} failed") from error
+
+    def flush(self):
+        # Wait until the waiting checkpoint, if any, is on disk
+        self.pending.join()
+        self._raise_error()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.pending.put(None)
+            self.thread.join()
+        self._raise_error()
@@ -0,0 +1,108 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+def edge_index_to_adjacency(edge_index, num_nodes):
+    """
+    Convert the edge_index of a single graph to a dense boolean mask.
+
+    adjacency[i, j] is True when there is an edge j -> i, i.e. node i attends to node j.
+    """
+    adjacency = torch.zeros(num_nodes, num_nodes, dtype=torch.bool, device=edge_index.device)
+    adjacency[edge_index[1], edge_index[0]] = True
+    return adjacency
+
+def fully_connected_adjacency(num_nodes, self_loops=False):
+    adjacency = torch.ones(num_nodes, num_nodes, dtype=torch.bool)
+    if not self_loops:
+        adjacency.fill_diagonal_(False)
+    return adjacency
+
+class DenseGATConv(nn.Module):
+    """
+    Single-head GATConv (add_self_loops=False) evaluated as dense attention over [B, N, N].
+
+    Parameter names and shapes match torch_geometric's GATConv, so state dicts are interchangeable.
+    """
+
+    def __init__(self, in_channels, out_channels, negative_slope=0.2):
+        super(DenseGATConv, self).__init__()
+        self.negative_slope = negative_slope
+        self.lin = nn.Linear(in_channels, out_channels, bias=False)
+        self.att_src = nn.Parameter(torch.empty(1, 1, out_channels))
+        self.att_dst = nn.Parameter(torch.empty(1, 1, out_channels))
+        self.bias = nn.Parameter(torch.empty(out_channels))
+        self.reset_parameters()
+
+    def reset_parameters(self):
+        nn.init.xavier_uniform_(self.lin.weight)
+        nn.init.xavier_uniform_(self.att_src)
+        nn.init.xavier_uniform_(self.att_dst)
+        nn.init.zeros_(self.bias)
+
+    def forward(self, x, adjacency):
+        # x: [B, N, F], adjacency: [N, N] or [B, N, N]
+        x = self.lin(x)
+        alpha_src = (x * self.att_src.view(1, 1, -1)).sum(dim=-1)
+        alpha_dst = (x * self.att_dst.view(1, 1, -1)).sum(dim=-1)
+
+        scores = F.leaky_relu(alpha_dst.unsqueeze(-1) + alpha_src.unsqueeze(-2), self.negative_slope)
+        # Nodes without incoming edges would softmax an all -inf row into NaNs. Give them finite
+        # scores and zero their attention afterwards: like the sparse path they aggregate nothing.
+        has_edges = adjacency.any(dim=-1, keepdim=True)
+        scores = scores.masked_fill(~adjacency, float('-inf')).masked_fill(~has_edges, 0.0)
+        attention = torch.softmax(scores, dim=-1) * has_edges
+
+        return torch.matmul(attention, x) + self.bias
+
+class DenseGCN(nn.Module):
+    """
+    Dense execution engine for GCN / GNNModel.
+
+    Loads the same state dict as the sparse models and produces the same outputs, but replaces
+    PyG's scatter/gather message passing with batched matmuls, which is faster for the small
+    fully connected agent graphs used here. `adjacency` is the [N, N] mask of one agent graph
+    (see edge_index_to_adjacency); forward takes the same Data batches as the sparse model, and
+    uses their own [B, N, N] `adjacency` instead when they have one (k-NN / radius graphs).
+    """
+
+    def __init__(self, input_dim, hidden_dim, output_dim, adjacency=None):
+        super(DenseGCN, self).__init__()
+        self.conv1 = DenseGATConv(input_dim, hidden_dim)
+        self.conv2 = DenseGATConv(hidden_dim, hidden_dim)
+        self.conv3 = DenseGATConv(hidden_dim, hidden_dim)
+        self.lin1 = nn.Linear(hidden_dim, hidden_dim)
+        self.lin2 = nn.Linear(hidden_dim, output_dim)
+        # Topology is not a learned parameter, keep it out of the state dict
+        self.register_buffer('adjacency', adjacency, persistent=False)
+
+    @classmethod
+    def from_sparse(cls, model, adjacency):
+        dense_model = cls(
+            model.conv1.in_channels,
+            model.conv1.out_channels,
+            model.lin2.out_features,
+            adjacency=adjacency,
+        )
+        dense_model.load_state_dict(model.state_dict())
+        dense_model.train(model.training)
+        return dense_model
+
+    def forward(self, data):
+        adjacency = data.adjacency if 'adjacency' in data else self.adjacency
+        n_agents = adjacency.shape[-1]
+        x = data.x.view(-1, n_agents, data.x.shape[-1])
+        x = self.forward_dense(x, adjacency)
+        return x.reshape(-1, x.shape[-1])
+
+    def forward_dense(self, x, adjacency):
+        x = self.conv1(x, adjacency)
+        x = torch.relu(x)
+        x = self.conv2(x, adjacency)
+        x = torch.relu(x)
+        x = self.conv3(x, adjacency)
+        x = torch.relu(x)
+        x = self.lin1(x)
+        x = torch.relu(x)
+        x = self.lin2(x)
+        return x
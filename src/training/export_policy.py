@@ -0,0 +1,113 @@
+import os
+import re
+import glob
+import argparse
+import torch
+import torch.nn as nn
+from dense_gat import DenseGCN, fully_connected_adjacency
+
+# Dynamic quantization modes: dtype of the Linear weights
+QUANTIZATION = {'int8': torch.qint8}
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'models'))
+
+def graph_adjacency(n_agents):
+    # The fully connected graph GraphBuilder feeds the policies, including its extra (0, 0) edge
+    adjacency = fully_connected_adjacency(n_agents)
+    adjacency[0, 0] = True
+    return adjacency
+
+class FrozenPolicy(nn.Module):
+    """
+    Policy with its agent graph baked in, as exported by export_policy.
+
+    Takes the raw [B, N, F] observations of a StackedEnv, appends the agent-id feature the
+    GCNs were trained with and returns [B, N, n_actions] Q-values from the dense engine.
+    """
+
+    def __init__(self, model, n_agents):
+        super(FrozenPolicy, self).__init__()
+        self.model = model
+        self.register_buffer('adjacency', graph_adjacency(n_agents))
+        self.register_buffer('agent_ids', torch.arange(n_agents, dtype=torch.float32).view(1, -1, 1))
+
+    def forward(self, observations):
+        agent_ids = self.agent_ids.expand(observations.shape[0], -1, -1)
+        return self.model.forward_dense(torch.cat([observations, agent_ids], dim=-1), self.adjacency)
+
+def frozen_path(checkpoint, n_agents, quantize=None):
+    mode = f'{quantize}_' if quantize else ''
+    return os.path.splitext(checkpoint)[0] + f'.frozen_{mode}{n_agents}.pt'
+
+def quantize_policy(policy, quantize):
+    """
+    Dynamic quantization of every Linear layer (the attention projections conv*.lin, lin1 and
+    lin2). With 'int8' weights are stored as int8 and activations are quantized on the fly per
+    call.
+    """
+    if quantize not in QUANTIZATION:
+        raise ValueError(f"Unknown quantization '{quantize}', expected one of {list(QUANTIZATION)}")
+    return torch.ao.quantization.quantize_dynamic(policy, {nn.Linear}, dtype=QUANTIZATION[quantize])
+
+def export_policy(checkpoint, n_agents, output=None, quantize=None):
+    """
+    Export a GCN checkpoint (.pth state dict) as a frozen TorchScript policy for n_agents agents.
+
+    The model is traced through the dense engine, frozen with its weights and topology as
+    constants and optimized for inference. The artifact runs with torch alone, see load_policy.
+    quantize ('int8') quantizes the Linear layers, see quantize_policy; check those
+    policies with tests/validate_quantized.py before using them.
+
+    Returns:
+    str: Path of the exported policy, by default next to the checkpoint.
+    """
+    state_dict = torch.load(checkpoint, map_location='cpu')
+    weight = state_dict['conv1.lin.weight']
+    model = DenseGCN(input_dim=weight.shape[1], hidden_dim=weight.shape[0], output_dim=state_dict['lin2.weight'].shape[0])
+    model.load_state_dict(state_dict)
+    policy = FrozenPolicy(model, n_agents).eval()
+    if quantize:
+        policy = quantize_policy(policy, quantize)
+
+    # Batch of two so tracing does not specialize on a size-1 batch dimension
+    example = torch.zeros(2, n_agents, weight.shape[1] - 1)
+    with torch.no_grad():
+        frozen = torch.jit.optimize_for_inference(torch.jit.freeze(torch.jit.trace(policy, example)))
+    output = output or frozen_path(checkpoint, n_agents, quantize)
+    # Write then rename, parallel evaluation workers may export the same checkpoint at once
+    temporary = f'{output}.{os.getpid()}.tmp'
+    torch.jit.save(frozen, temporary)
+    os.replace(temporary, output)
+    return output
+
+def load_policy(path, device='cpu'):
+    """
+    Load a policy exported by export_policy. Needs neither torch_geometric nor the model classes.
+    """
+    return torch.jit.load(path, map_location=device)
+
+def load_frozen_policy(checkpoint, n_agents, device='cpu', quantize=None):
+    """
+    Load the frozen policy of a checkpoint, exporting it first if it is missing or older.
+
+    Quantized policies are never exported here: they only exist once tests/validate_quantized.py
+    has accepted that mode for this checkpoint and agent count.
+    """
+    path = frozen_path(checkpoint, n_agents, quantize)
+    if quantize:
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(checkpoint):
+            raise FileNotFoundError(f"No validated {quantize} policy for {checkpoint} with {n_agents} agents, run tests/validate_quantized.py first")
+    elif not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(checkpoint):
+        export_policy(checkpoint, n_agents, path)
+    return load_policy(path, device)
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Export GCN checkpoints as frozen TorchScript policies.")
+    parser.add_argument('checkpoints', nargs='*', help="Default: every .pth in models/")
+    parser.add_argument('--agents', type=int, default=None, help="Default: the trailing number of the file name, else 5")
+    args = parser.parse_args()
+
+    for checkpoint in args.checkpoints or sorted(glob.glob(os.path.join(MODELS_DIR, '*.pth'))):
+        n_agents = re.search(r'_(\d+)\.pth$', checkpoint)
+        n_agents = args.agents or (int(n_agents.group(1)) if n_agents else 5)
+        print(f"Exported {checkpoint} for {n_agents} agents to {export_policy(checkpoint, n_agents)}")
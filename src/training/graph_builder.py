@@ -0,0 +1,105 @@
+import torch
+from torch_geometric.data import Data
+from dense_gat import edge_index_to_adjacency
+from topology import check_topology, topology_adjacency
+
+def adjacency_to_edge_index(adjacency):
+    # [B, N, N] masks -> edge_index of the B graphs, node ids offset per graph as in Batch.from_data_list
+    env, target, source = adjacency.nonzero(as_tuple=True)
+    offsets = env * adjacency.shape[-1]
+    return torch.stack([source + offsets, target + offsets])
+
+class GraphBuilder:
+    """
+    Build the agent graphs fed to the GCN policies.
+
+    The fully connected topology is computed once per (n_agents, batch size) and shared by
+    every builder, and node features are copied into preallocated buffers, so building a graph
+    on the hot path only copies the observations. The graphs are identical to the ones the
+    checkpoints in models/ were trained on, including the extra (0, 0) edge.
+
+    A returned graph aliases one of `n_slots` buffers and stays valid until `n_slots` more
+    graphs with the same shape have been built; copy its node features to keep it longer.
+
+    With topology "knn" or "radius" the edges are instead recomputed for every graph from the
+    agent positions (node feature columns 0:2), and the graph also carries its [B, N, N]
+    `adjacency` mask for the dense engine.
+    """
+
+    _topologies = {}
+
+    def __init__(self, n_agents, n_slots=2, topology="full", k=None, radius=None):
+        check_topology(topology, k, radius)
+        self.n_agents = n_agents
+        self.n_slots = n_slots
+        self.topology = topology
+        self.k = k
+        self.radius = radius
+        self.graphs = {}
+        self.next_slot = {}
+
+    def edge_index(self, batch_size=1):
+        key = (self.n_agents, batch_size)
+        if key not in GraphBuilder._topologies:
+            GraphBuilder._topologies[key] = self._build_edge_index(batch_size)
+        return GraphBuilder._topologies[key]
+
+    def _build_edge_index(self, batch_size):
+        if batch_size == 1:
+            rows, cols = torch.triu_indices(self.n_agents, self.n_agents, offset=1)
+            # (i, j) followed by (j, i) for every pair i < j, then the (0, 0) edge
+            edge_index = torch.stack([torch.stack([rows, cols]), torch.stack([cols, rows])], dim=2).reshape(2, -1)
+            return torch.cat([edge_index, torch.zeros(2, 1, dtype=torch.long)], dim=1).contiguous()
+
+        # Same layout as Batch.from_data_list: one copy of the graph per env, offset by n_agents
+        offsets = torch.arange(batch_size) * self.n_agents
+        return (self.edge_index(1).unsqueeze(1) + offsets.view(1, -1, 1)).reshape(2, -1).contiguous()
+
+    def adjacency(self):
+        # Fully connected mask of one graph; dynamic topologies attach theirs to every graph
+        return edge_index_to_adjacency(self.edge_index(1), self.n_agents)
+
+    def _attach_topology(self, graph_data, node_features):
+        if self.topology == "full":
+            return graph_data
+        adjacency = topology_adjacency(node_features[..., :2], self.topology, self.k, self.radius)
+        graph_data.edge_index = adjacency_to_edge_index(adjacency)
+        graph_data.adjacency = adjacency
+        return graph_data
+
+    def _allocate(self, batch_size, n_features, dtype, device):
+        buffers = torch.empty(self.n_slots, batch_size, self.n_agents, n_features + 1, dtype=dtype, device=device)
+        buffers[..., -1] = torch.arange(self.n_agents, dtype=dtype, device=device)
+        edge_index = self.edge_index(batch_size).to(device)
+        return [Data(x=buffers[slot].view(-1, n_features + 1), edge_index=edge_index) for slot in range(self.n_slots)]
+
+    def build(self, observations):
+        # observations: [B, N, F] from a StackedEnv, or the per-agent dict of a VMAS env
+        if isinstance(observations, dict):
+            observations = torch.stack([observations[f'agent{i}'] for i in range(self.n_agents)], dim=1)
+        batch_size, _, n_features = observations.shape
+        key = (batch_size, n_features)
+        if key not in self.graphs:
+            self.graphs[key] = self._allocate(batch_size, n_features, observations.dtype, observations.device)
+            self.next_slot[key] = 0
+
+        slot = self.next_slot[key]
+        self.next_slot[key] = (slot + 1) % self.n_slots
+        graph_data = self.graphs[key][slot]
+
+        node_features = graph_data.x.view(batch_size, self.n_agents, n_features + 1)
+        node_features[..., :n_features].copy_(observations)
+        return self._attach_topology(graph_data, node_features)
+
+    def node_features(self, graph_data):
+        return graph_data.x.view(-1, self.n_agents, graph_data.x.shape[-1])
+
+    def add_agent_ids(self, observations):
+        # observations: [B, N, F] raw agent observations -> [B, N, F + 1] node features
+        agent_ids = torch.arange(self.n_agents, dtype=observations.dtype, device=observations.device)
+        return torch.cat([observations, agent_ids.view(1, -1, 1).expand(observations.shape[0], -1, 1)], dim=-1)
+
+    def from_node_features(self, node_features):
+        # node_features: [B, N, F] -> one Data batch of B agent graphs
+        graph_data = Data(x=node_features.reshape(-1, node_features.shape[-1]), edge_index=self.edge_index(node_features.shape[0]))
+        return self._attach_topology(graph_data, node_features)
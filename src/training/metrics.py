@@ -0,0 +1,81 @@
+import csv
+import os
+import queue
+import threading
+import torch
+
+class MetricsLogger:
+    """
+    Buffered scalar logging for the training loop.
+
+    add() accumulates a scalar tensor into an on-device running sum without synchronizing or
+    calling into TensorBoard. Every `reduce_every` ticks the sums of all metrics are reduced to
+    their means with a single device-to-host copy, and the results are handed to a background
+    thread that writes them to the SummaryWriter and to a long-format CSV (tick, name, value).
+    The cost per tick is therefore a tensor add per metric, whatever the number of envs or steps.
+
+    add_scalar() forwards an already reduced value through the same thread, so the logger can
+    stand in for the SummaryWriter (e.g. for PhaseTimer.end_episode).
+    """
+
+    def __init__(self, writer, reduce_every=100, csv_path=None):
+        self.writer = writer
+        self.reduce_every = reduce_every
+        self.csv_path = csv_path if csv_path is not None else os.path.join(writer.log_dir, 'metrics.csv')
+        self.sums = {}
+        self.counts = {}
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+
+    def add(self, name, value):
+        value = value.detach().float() if isinstance(value, torch.Tensor) else torch.tensor(float(value))
+        self.sums[name] = self.sums[name] + value if name in self.sums else value
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def end_tick(self, tick):
+        if tick % self.reduce_every == 0:
+            self.reduce(tick)
+
+    def reduce(self, tick):
+        if not self.sums:
+            return
+        names = list(self.sums)
+        sums = torch.stack([self.sums[name] for name in names])
+        means = (sums / torch.tensor([self.counts[name] for name in names], device=sums.device)).tolist()
+        self.pending.put((tick, dict(zip(names, means))))
+        self.sums = {}
+        self.counts = {}
+
+    def add_scalar(self, name, value, tick):
+        self.pending.put((tick, {name: float(value)}))
+
+    def _write(self):
+        with open(self.csv_path, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Tick', 'Name', 'Value'])
+            while True:
+                item = self.pending.get()
+                if item is None:
+                    self.pending.task_done()
+                    break
+                tick, values = item
+                for name, value in values.items():
+                    self.writer.add_scalar(name, value, tick)
+                    writer.writerow([tick, name, value])
+                if self.pending.empty():
+                    file.flush()
+                self.pending.task_done()
+
+    def flush(self, tick=None):
+        # Reduce what is left (at `tick` if given) and wait until everything queued is written
+        if tick is not None:
+            self.reduce(tick)
+        self.pending.join()
+        self.writer.flush()
+
+    def close(self, tick=None):
+        self.flush(tick)
+        if self.thread.is_alive():
+            self.pending.put(None)
+            self.thread.join()
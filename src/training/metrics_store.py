@@ -0,0 +1,214 @@
+import os
+import re
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+PARTITIONS = ['scenario', 'n_agents', 'phase', 'experiment', 'seed']
+GROUP = ['scenario', 'n_agents', 'phase', 'experiment', 'metric', 'Episode']
+# Experiment of the per-seed CSVs committed in stats/, new runs are stored under their own name
+PUBLISHED = 'published'
+# Welford state kept per (metric, Episode) of a group; std and quantiles are derived on read
+STATE = ['metric', 'Episode', 'count', 'mean', 'm2', 'min', 'max']
+QUANTILES = {'q25': 0.25, 'median': 0.5, 'q75': 0.75}
+HIVE = ds.partitioning(
+    pa.schema([('scenario', pa.string()), ('n_agents', pa.int64()), ('phase', pa.string()), ('experiment', pa.string())]),
+    flavor='hive',
+)
+
+class MetricsStore:
+    """
+    Parquet store of per-episode run metrics, partitioned by scenario, agent count, phase,
+    experiment and seed.
+
+    Every run is one file, runs/scenario=<s>/n_agents=<n>/phase=<p>/experiment=<e>/seed=<seed>.parquet,
+    in long format (Episode, metric, value), so runs with different metrics (Reward, Hits, ...)
+    coexist. The CSVs committed in stats/ are the 'published' experiment; new runs are kept in a
+    group of their own so they never mix with it. Next to the runs,
+    aggregates/scenario=<s>/n_agents=<n>/phase=<p>/experiment=<e>/aggregates.parquet keeps the
+    Welford state (count, mean, m2, min, max) of every (metric, Episode) of that group over its
+    seeds. append() folds a new run into its group's state, reading and rewriting only that
+    group's file and the new run, so plots can read means and spreads without scanning the runs.
+    Quantiles cannot be folded exactly, aggregates(quantiles=True) computes them from the runs
+    of the requested groups. Re-appending an existing seed replaces it and rebuilds only that
+    group from its run files. The averaged CSVs of stats/ (mean.csv, ...) are published results:
+    the store never reads or writes them.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.runs_dir = os.path.join(root, 'runs')
+        self.aggregates_dir = os.path.join(root, 'aggregates')
+        os.makedirs(self.runs_dir, exist_ok=True)
+        os.makedirs(self.aggregates_dir, exist_ok=True)
+
+    def run_path(self, scenario, n_agents, phase, seed, experiment=PUBLISHED):
+        directory = os.path.join(self.runs_dir, f'scenario={scenario}', f'n_agents={n_agents}', f'phase={phase}', f'experiment={experiment}')
+        return os.path.join(directory, f'seed={seed}.parquet')
+
+    def aggregates_path(self, scenario, n_agents, phase, experiment=PUBLISHED):
+        return os.path.join(self.aggregates_dir, f'scenario={scenario}', f'n_agents={n_agents}', f'phase={phase}', f'experiment={experiment}', 'aggregates.parquet')
+
+    def append(self, scenario, n_agents, phase, seed, frame, experiment=PUBLISHED):
+        """
+        Store one run and update the aggregates of its (scenario, n_agents, phase, experiment) group.
+
+        Parameters:
+        frame (pd.DataFrame): An 'Episode' column plus one column per metric, e.g. the CSVs
+        written by save_metrics_to_csv.
+        """
+        run = frame.melt(id_vars='Episode', var_name='metric', value_name='value')
+        run['value'] = run['value'].astype('float64')
+        path = self.run_path(scenario, n_agents, phase, seed, experiment)
+        replacing = os.path.exists(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(pa.Table.from_pandas(run, preserve_index=False), path)
+
+        aggregates_path = self.aggregates_path(scenario, n_agents, phase, experiment)
+        if replacing or not os.path.exists(aggregates_path):
+            state = _aggregate(self.runs(scenario=scenario, n_agents=n_agents, phase=phase, experiment=experiment))
+        else:
+            state = _fold(pq.read_table(aggregates_path).to_pandas(), run)
+        os.makedirs(os.path.dirname(aggregates_path), exist_ok=True)
+        _write_atomic(pa.Table.from_pandas(state.sort_values(['metric', 'Episode']), preserve_index=False), aggregates_path)
+
+    def append_csv(self, path, scenario, n_agents, phase, seed, experiment=PUBLISHED):
+        self.append(scenario, n_agents, phase, seed, pd.read_csv(path), experiment)
+
+    def _fragments(self, directory, filters):
+        # Parquet files of the partitions matching the scenario / n_agents / phase / experiment filters
+        if not any(os.scandir(directory)):
+            return []
+        dataset = ds.dataset(directory, format='parquet', partitioning=HIVE)
+        expression = None
+        for name, value in filters.items():
+            if name not in ('scenario', 'n_agents', 'phase', 'experiment'):
+                continue
+            condition = ds.field(name) == value
+            expression = condition if expression is None else expression & condition
+        return dataset.get_fragments(filter=expression)
+
+    def runs(self, **filters):
+        """
+        Per-seed rows matching equality filters on scenario, n_agents, phase, experiment and/or
+        seed. Only the matching partitions are read.
+        """
+        frames = []
+        for fragment in self._fragments(self.runs_dir, filters):
+            seed = int(re.search(r'seed=(-?\d+)\.parquet$', fragment.path).group(1))
+            if 'seed' in filters and seed != filters['seed']:
+                continue
+            keys = ds.get_partition_keys(fragment.partition_expression)
+            frames.append(fragment.to_table().to_pandas().assign(seed=seed, **keys))
+        if not frames:
+            return pd.DataFrame(columns=PARTITIONS + ['Episode', 'metric', 'value'])
+        return pd.concat(frames, ignore_index=True)[PARTITIONS + ['Episode', 'metric', 'value']]
+
+    def aggregates(self, metric=None, quantiles=False, **filters):
+        """
+        Aggregate rows (count, mean, std, min, max per Episode) matching the given metric and
+        equality filters on scenario, n_agents, phase and/or experiment. Only the matching groups
+        are read.
+        With quantiles, q25, median and q75 are added from the runs of those groups.
+        """
+        frames = []
+        for fragment in self._fragments(self.aggregates_dir, filters):
+            keys = ds.get_partition_keys(fragment.partition_expression)
+            frames.append(fragment.to_table().to_pandas().assign(**keys))
+        if not frames:
+            return pd.DataFrame(columns=GROUP + ['count', 'mean', 'm2', 'std', 'min', 'max'] + (list(QUANTILES) if quantiles else []))
+        aggregates = pd.concat(frames, ignore_index=True)
+        if metric is not None:
+            aggregates = aggregates[aggregates['metric'] == metric]
+        aggregates = aggregates[GROUP + STATE[2:]].sort_values(GROUP).reset_index(drop=True)
+        aggregates['std'] = np.sqrt(aggregates['m2'] / (aggregates['count'] - 1).clip(lower=1))
+        if quantiles:
+            runs = self.runs(**filters)
+            if metric is not None:
+                runs = runs[runs['metric'] == metric]
+            runs = runs.astype({'n_agents': 'int64'})
+            grouped = runs.groupby(GROUP)['value']
+            for name, q in QUANTILES.items():
+                aggregates = aggregates.merge(grouped.quantile(q).rename(name).reset_index(), on=GROUP, how='left')
+        return aggregates
+
+    def import_stats_dir(self, stats_dir, default_agents=5, default_phase='training'):
+        """
+        Load the per-seed CSVs of a stats/<scenario>/<phase>_<n>/ tree as the 'published'
+        experiment. The experiment subdirectories written by run_seeds are skipped, and so are
+        files with 'mean' in their name: they hold already averaged curves (mean.csv,
+        hits_mean.csv, ..._mean_400_47.csv).
+
+        Directories without an agent count (e.g. training/) use default_agents, and CSVs directly
+        under the scenario directory use default_phase. The seed is the trailing number of the
+        file name.
+        """
+        for scenario in sorted(os.listdir(stats_dir)):
+            scenario_dir = os.path.join(stats_dir, scenario)
+            # The store itself may live inside stats_dir
+            if not os.path.isdir(scenario_dir) or os.path.abspath(scenario_dir) == os.path.abspath(self.root):
+                continue
+            for directory, _, files in sorted(os.walk(scenario_dir)):
+                relative = os.path.relpath(directory, scenario_dir)
+                if relative == '.':
+                    phase, n_agents = default_phase, default_agents
+                else:
+                    match = re.fullmatch(r'([a-z]+)(?:_(\d+))?', relative)
+                    if match is None:
+                        continue
+                    phase, n_agents = match.group(1), int(match.group(2) or default_agents)
+                for name in sorted(files):
+                    stem, extension = os.path.splitext(name)
+                    seed = re.search(r'_(\d+)$', stem)
+                    if extension != '.csv' or 'mean' in stem or seed is None:
+                        continue
+                    self.append_csv(os.path.join(directory, name), scenario, n_agents, phase, int(seed.group(1)))
+
+def _write_atomic(table, path):
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+def _aggregate(runs):
+    grouped = runs.groupby(['metric', 'Episode'])['value']
+    state = grouped.agg(['count', 'mean', 'min', 'max']).reset_index()
+    state['m2'] = grouped.var(ddof=0).values * state['count'].values
+    return state[STATE]
+
+def _fold(state, run):
+    # Welford's update for one new value per (metric, Episode); rows new to the group start empty
+    merged = run.merge(state, on=['metric', 'Episode'], how='outer')
+    first = merged['count'].isna()
+    merged.loc[first, ['count', 'mean', 'm2']] = 0.0
+    merged.loc[first, 'min'] = np.inf
+    merged.loc[first, 'max'] = -np.inf
+
+    new = merged['value'].notna()
+    value = merged.loc[new, 'value']
+    count = merged.loc[new, 'count'] + 1
+    delta = value - merged.loc[new, 'mean']
+    merged.loc[new, 'mean'] = merged.loc[new, 'mean'] + delta / count
+    merged.loc[new, 'm2'] = merged.loc[new, 'm2'] + delta * (value - merged.loc[new, 'mean'])
+    merged.loc[new, 'count'] = count
+    merged.loc[new, 'min'] = np.minimum(merged.loc[new, 'min'], value)
+    merged.loc[new, 'max'] = np.maximum(merged.loc[new, 'max'], value)
+
+    merged['count'] = merged['count'].astype('int64')
+    return merged[STATE]
+
+def open_stats_store(stats_dir='stats'):
+    """
+    Open the store kept in stats_dir/store. Reading never imports anything: the CSVs already in
+    stats_dir are loaded by running this module once (import_stats_dir).
+    """
+    return MetricsStore(os.path.join(stats_dir, 'store'))
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Import the per-seed CSVs of a stats/ tree into its metrics store.")
+    parser.add_argument('--stats-dir', default='stats')
+    args = parser.parse_args()
+
+    open_stats_store(args.stats_dir).import_stats_dir(args.stats_dir)
@@ -0,0 +1,70 @@
+import time
+from contextlib import nullcontext
+
+class _Phase:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timer.record(self.name, time.perf_counter() - self.start)
+
+class PhaseTimer:
+    """
+    Opt-in wall-clock timers for the phases of a training loop.
+
+    `with timer.phase('env_step'): ...` accumulates the time spent in each named phase over an
+    episode; end_episode() exports the per-phase totals to TensorBoard and folds them into the
+    run totals reported by summary(). A disabled timer hands out one shared no-op context, so the
+    instrumented loop costs a `with` statement per phase and nothing else.
+    """
+
+    _disabled = nullcontext()
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = {}
+        self.episode_times = {}
+        self.total_times = {}
+        self.total_calls = {}
+        self.episodes = 0
+
+    def phase(self, name):
+        if not self.enabled:
+            return PhaseTimer._disabled
+        if name not in self.phases:
+            self.phases[name] = _Phase(self, name)
+        return self.phases[name]
+
+    def record(self, name, elapsed):
+        self.episode_times[name] = self.episode_times.get(name, 0.0) + elapsed
+        self.total_calls[name] = self.total_calls.get(name, 0) + 1
+
+    def end_episode(self, writer, episode):
+        if not self.enabled:
+            return
+        for name, elapsed in self.episode_times.items():
+            writer.add_scalar(f'Profile/{name}_s', elapsed, episode)
+            self.total_times[name] = self.total_times.get(name, 0.0) + elapsed
+        writer.add_scalar('Profile/instrumented_s', sum(self.episode_times.values()), episode)
+        self.episode_times = {}
+        self.episodes += 1
+
+    def summary(self):
+        """
+        Returns:
+        str: One row per phase with its call count, total time, mean time per call and share of
+        the instrumented time, slowest phase first.
+        """
+        total = sum(self.total_times.values())
+        lines = [f"{'phase':<16} {'calls':>9} {'total (s)':>10} {'mean (ms)':>10} {'share':>7}"]
+        for name, elapsed in sorted(self.total_times.items(), key=lambda item: -item[1]):
+            calls = self.total_calls[name]
+            lines.append(f"{name:<16} {calls:>9} {elapsed:>10.3f} {elapsed / calls * 1e3:>10.3f} {elapsed / (total or 1.0) * 100:>6.1f}%")
+        lines.append(f"{'total':<16} {'':>9} {total:>10.3f} over {self.episodes} episodes")
+        return "\n".join(lines)
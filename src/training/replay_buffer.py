@@ -0,0 +1,451 @@
+import json
+import os
+import numpy as np
+import torch
+
+class GraphReplayBuffer:
+    """
+    Ring replay buffer of agent-graph transitions backed by preallocated tensors.
+
+    Agent count and topology are fixed within a run, so a transition only needs the node
+    features of its two graphs ([N, F] each), per-agent actions and rewards, and the discount
+    applied to the bootstrapped value of its next graph (gamma ** n for an n-step transition,
+    0 after a termination; see NStepAccumulator). Storage is
+    allocated on the first push, sampling is a single index gather, and the batched edge_index
+    comes from the GraphBuilder topology cache.
+    """
+
+    STORAGE = ('observations', 'actions', 'rewards', 'next_observations', 'discounts')
+
+    def __init__(self, capacity, graph_builder):
+        self.capacity = capacity
+        self.graph_builder = graph_builder
+        self.position = 0
+        self.size = 0
+        self.observations = None
+
+    def _allocate(self, observations, actions, rewards):
+        self.observations = torch.empty((self.capacity,) + observations.shape[1:], dtype=observations.dtype, device=observations.device)
+        self.next_observations = torch.empty_like(self.observations)
+        self.actions = torch.empty((self.capacity,) + actions.shape[1:], dtype=actions.dtype, device=actions.device)
+        self.rewards = torch.empty((self.capacity,) + rewards.shape[1:], dtype=rewards.dtype, device=rewards.device)
+        self.discounts = torch.empty(self.capacity, dtype=rewards.dtype, device=rewards.device)
+
+    def push(self, observations, actions, rewards, next_observations, discounts):
+        # observations: [B, N, F] node features of B graphs, actions and rewards: [B, N], discounts: [B]
+        if self.observations is None:
+            self._allocate(observations, actions, rewards)
+
+        indices = (self.position + torch.arange(observations.shape[0])) % self.capacity
+        self.observations[indices] = observations
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_observations[indices] = next_observations
+        self.discounts[indices] = discounts
+
+        self.position = (self.position + observations.shape[0]) % self.capacity
+        self.size = min(self.size + observations.shape[0], self.capacity)
+        return indices
+
+    def sample(self, batch_size):
+        # Without replacement, like the random.sample of the list-backed buffer
+        return self.gather(torch.randperm(self.size)[:batch_size])
+
+    def gather(self, indices):
+        return (
+            self.graph_builder.from_node_features(self.observations[indices]),
+            self.actions[indices].view(-1),
+            self.rewards[indices].view(-1),
+            self.graph_builder.from_node_features(self.next_observations[indices]),
+            # One discount per transition, repeated for each of its agents
+            self.discounts[indices].repeat_interleave(self.observations.shape[1]),
+        )
+
+    def __len__(self):
+        return self.size
+
+    def state_dict(self):
+        # Copies of the filled rows, so the state can be serialized while training goes on
+        state = {'position': self.position, 'size': self.size}
+        if self.observations is not None:
+            for name in self.STORAGE:
+                state[name] = getattr(self, name)[:self.size].clone()
+        return state
+
+    def load_state_dict(self, state):
+        if 'observations' in state:
+            if self.observations is None:
+                self._allocate(state['observations'], state['actions'], state['rewards'])
+            for name in self.STORAGE:
+                getattr(self, name)[:state['size']] = state[name]
+        self.position = state['position']
+        self.size = state['size']
+
+class NStepAccumulator:
+    """
+    Turn a stream of batched one-step transitions into n-step transitions at push time.
+
+    Keeps a rolling window of the last n_step observations and actions of every environment,
+    with their partial discounted returns and bootstrap discounts as [n_step, B, ...] tensors.
+    Each push adds the new rewards to every pending return in one masked multiply-add and,
+    once the window is full, emits the oldest step as
+
+        (obs_t, action_t, r_t + gamma r_t+1 + ... + gamma^(n-1) r_t+n-1, obs_t+n, gamma^n)
+
+    for all B environments at once. A termination zeroes the discounts of that environment's
+    pending steps, so their returns stop there and are not bootstrapped; flush() emits the
+    steps still pending at the end of an episode, each bootstrapped from the final observation
+    with gamma ** (steps it covers). With n_step=1 this is the usual (r, gamma) transition.
+    """
+
+    def __init__(self, n_step=1, gamma=0.99):
+        if n_step < 1:
+            raise ValueError(f"n_step must be at least 1, got {n_step}")
+        self.n_step = n_step
+        self.gamma = gamma
+        self.observations = None
+        self.start = 0
+        self.count = 0
+
+    def _allocate(self, observations, actions, rewards):
+        self.observations = torch.empty((self.n_step,) + observations.shape, dtype=observations.dtype, device=observations.device)
+        self.actions = torch.empty((self.n_step,) + actions.shape, dtype=actions.dtype, device=actions.device)
+        self.returns = torch.zeros((self.n_step,) + rewards.shape, dtype=rewards.dtype, device=rewards.device)
+        self.discounts = torch.zeros((self.n_step, rewards.shape[0]), dtype=rewards.dtype, device=rewards.device)
+
+    def push(self, observations, actions, rewards, next_observations, terminated=None):
+        """
+        Add one step of B environments.
+
+        Parameters:
+        observations, next_observations (torch.Tensor): [B, N, F] node features.
+        actions, rewards (torch.Tensor): [B, N].
+        terminated (torch.Tensor): Optional [B] bool, environments whose episode ended for good
+        (not by the time limit) on this step.
+
+        Returns:
+        tuple: (observations, actions, returns, next_observations, discounts) of the B n-step
+        transitions completed by this step, or None while the window is filling. The tensors
+        are views of the window, push them to a replay buffer before the next call.
+        """
+        if self.observations is None or self.observations.shape[1:] != observations.shape:
+            self._allocate(observations, actions, rewards)
+            self.start = 0
+            self.count = 0
+
+        slot = (self.start + self.count) % self.n_step
+        self.observations[slot] = observations
+        self.actions[slot] = actions
+        self.returns[slot] = 0
+        self.discounts[slot] = 1
+        self.count += 1
+
+        # Slots outside the window hold stale values, they are overwritten before being emitted
+        self.returns.add_(self.discounts.unsqueeze(-1) * rewards)
+        self.discounts.mul_(self.gamma)
+        if terminated is not None:
+            self.discounts.mul_(~terminated)
+        self.next_observations = next_observations
+
+        if self.count < self.n_step:
+            return None
+        oldest = self.start
+        self.start = (self.start + 1) % self.n_step
+        self.count -= 1
+        return self.observations[oldest], self.actions[oldest], self.returns[oldest], next_observations, self.discounts[oldest]
+
+    def flush(self):
+        """
+        Emit the steps still pending at the end of an episode and empty the window.
+
+        Returns:
+        tuple: The pending transitions of every environment, concatenated along the batch
+        dimension as one push, or None when nothing is pending.
+        """
+        if self.count == 0:
+            return None
+        slots = (self.start + torch.arange(self.count)) % self.n_step
+        transitions = (
+            self.observations[slots].flatten(0, 1),
+            self.actions[slots].flatten(0, 1),
+            self.returns[slots].flatten(0, 1),
+            self.next_observations.repeat(self.count, *([1] * (self.next_observations.dim() - 1))),
+            self.discounts[slots].flatten(0, 1),
+        )
+        self.start = 0
+        self.count = 0
+        return transitions
+
+class SumTree:
+    """
+    Array-backed sum-tree over `capacity` priorities.
+
+    Leaves live at [size, 2 * size) of a flat tensor, where size is capacity rounded up to a
+    power of two, and every internal node holds the sum of its two children. Updates and
+    prefix-sum searches process a whole batch at once, one tree level per iteration, so both
+    are O(log n) tensor ops regardless of batch size.
+    """
+
+    def __init__(self, capacity):
+        self.depth = max(1, (capacity - 1).bit_length())
+        self.size = 1 << self.depth
+        # float64 keeps the prefix sums exact enough for million-leaf trees
+        self.tree = torch.zeros(2 * self.size, dtype=torch.float64)
+
+    def total(self):
+        return self.tree[1].item()
+
+    def update(self, indices, priorities):
+        nodes = indices + self.size
+        self.tree[nodes] = priorities.to(torch.float64)
+        for _ in range(self.depth):
+            # Duplicate parents are recomputed from the same children, so repeated writes agree
+            nodes = nodes // 2
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values):
+        # Descend from the root to the leaf whose prefix-sum interval contains each value
+        nodes = torch.ones(values.shape[0], dtype=torch.long)
+        values = values.to(torch.float64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            left_sums = self.tree[left]
+            go_right = values >= left_sums
+            values = torch.where(go_right, values - left_sums, values)
+            nodes = left + go_right.long()
+        return nodes - self.size
+
+    def priorities(self, indices):
+        return self.tree[indices + self.size]
+
+class PrioritizedGraphReplayBuffer(GraphReplayBuffer):
+    """
+    Proportional prioritized replay (Schaul et al., 2016) over the tensor ring buffer.
+
+    New transitions get the highest priority seen so far. sample() draws one transition per
+    equal-mass segment of the sum-tree and also returns the sampled indices and normalized
+    importance-sampling weights. Priorities are refreshed from TD errors via update_priorities.
+    """
+
+    def __init__(self, capacity, graph_builder, alpha=0.6, beta=0.4, beta_increment=1e-5, epsilon=1e-6):
+        super(PrioritizedGraphReplayBuffer, self).__init__(capacity, graph_builder)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon
+        self.max_priority = 1.0
+        self.tree = SumTree(capacity)
+
+    def push(self, observations, actions, rewards, next_observations, discounts):
+        indices = super(PrioritizedGraphReplayBuffer, self).push(observations, actions, rewards, next_observations, discounts)
+        self.tree.update(indices, torch.full((indices.shape[0],), self.max_priority ** self.alpha))
+        return indices
+
+    def sample(self, batch_size):
+        total = self.tree.total()
+        segment = total / batch_size
+        values = (torch.arange(batch_size, dtype=torch.float64) + torch.rand(batch_size, dtype=torch.float64)) * segment
+        indices = self.tree.find(values.clamp_(max=total * (1 - 1e-12)))
+        # Guard against float round-off landing on an empty leaf past the filled region
+        indices = indices.clamp_(max=self.size - 1)
+
+        probabilities = self.tree.priorities(indices) / total
+        weights = (self.size * probabilities).pow(-self.beta)
+        weights = (weights / weights.max()).float()
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        return self.gather(indices) + (indices, weights)
+
+    def update_priorities(self, indices, td_errors):
+        priorities = td_errors.detach().abs().cpu().double() + self.epsilon
+        self.max_priority = max(self.max_priority, priorities.max().item())
+        self.tree.update(indices, priorities.pow(self.alpha))
+
+    def state_dict(self):
+        state = super(PrioritizedGraphReplayBuffer, self).state_dict()
+        state.update(tree=self.tree.tree.clone(), max_priority=self.max_priority, beta=self.beta)
+        return state
+
+    def load_state_dict(self, state):
+        super(PrioritizedGraphReplayBuffer, self).load_state_dict(state)
+        self.tree.tree.copy_(state['tree'])
+        self.max_priority = state['max_priority']
+        self.beta = state['beta']
+
+class MemmapGraphReplayBuffer(GraphReplayBuffer):
+    """
+    GraphReplayBuffer whose storage lives in memory-mapped files under `directory`.
+
+    Only the OS page cache holds transitions in RAM, so capacity is bounded by disk rather than
+    memory. Observations are stored without the agent-id column (rebuilt by the GraphBuilder on
+    sampling), either as float16 or as uint8 quantized linearly over `value_range`. The ring
+    position is persisted in meta.json every `flush_every` pushes and on flush(), so a killed run
+    can reopen its buffer by pointing a new instance at the same directory.
+    """
+
+    STORAGE_DTYPES = {"float16": np.float16, "uint8": np.uint8}
+
+    def __init__(self, capacity, graph_builder, directory, storage="float16", value_range=(-2.0, 2.0), flush_every=1000):
+        super(MemmapGraphReplayBuffer, self).__init__(capacity, graph_builder)
+        if storage not in self.STORAGE_DTYPES:
+            raise ValueError(f"Unknown storage '{storage}', expected one of {list(self.STORAGE_DTYPES)}")
+        self.directory = directory
+        self.storage = storage
+        self.value_range = value_range
+        self.flush_every = flush_every
+        self.pushes_since_flush = 0
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self._path('meta.json')):
+            self._reopen()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _open(self, mode, observation_shape=None, n_agents=None):
+        observation_dtype = self.STORAGE_DTYPES[self.storage]
+        self.observations = np.lib.format.open_memmap(self._path('observations.npy'), mode=mode, dtype=observation_dtype, shape=observation_shape)
+        self.next_observations = np.lib.format.open_memmap(self._path('next_observations.npy'), mode=mode, dtype=observation_dtype, shape=observation_shape)
+        self.actions = np.lib.format.open_memmap(self._path('actions.npy'), mode=mode, dtype=np.int16, shape=None if n_agents is None else (self.capacity, n_agents))
+        self.rewards = np.lib.format.open_memmap(self._path('rewards.npy'), mode=mode, dtype=np.float32, shape=None if n_agents is None else (self.capacity, n_agents))
+        self.discounts = np.lib.format.open_memmap(self._path('discounts.npy'), mode=mode, dtype=np.float32, shape=None if n_agents is None else (self.capacity,))
+
+    def _allocate(self, observations, actions, rewards):
+        # Drop the agent-id column, it is the same for every transition
+        self._open('w+', (self.capacity, *observations.shape[1:-1], observations.shape[-1] - 1), actions.shape[1])
+        self.flush()
+
+    def _reopen(self):
+        with open(self._path('meta.json')) as file:
+            meta = json.load(file)
+        if meta['capacity'] != self.capacity or meta['storage'] != self.storage:
+            raise ValueError(
+                f"Replay buffer in {self.directory} has capacity {meta['capacity']} and storage '{meta['storage']}', "
+                f"expected {self.capacity} and '{self.storage}'"
+            )
+        if not os.path.exists(self._path('discounts.npy')):
+            raise ValueError(f"Replay buffer in {self.directory} predates stored discounts, delete it to start a new one")
+        self.value_range = tuple(meta['value_range'])
+        self.position = meta['position']
+        self.size = meta['size']
+        self._open('r+')
+
+    def _encode(self, node_features):
+        observations = node_features[..., :-1].detach().cpu()
+        if self.storage == "uint8":
+            low, high = self.value_range
+            observations = ((observations - low) / (high - low) * 255).round().clamp(0, 255)
+        return observations.numpy().astype(self.STORAGE_DTYPES[self.storage])
+
+    def _decode(self, observations):
+        observations = torch.from_numpy(observations.astype(np.float32))
+        if self.storage == "uint8":
+            low, high = self.value_range
+            observations = observations / 255 * (high - low) + low
+        return self.graph_builder.add_agent_ids(observations)
+
+    def push(self, observations, actions, rewards, next_observations, discounts):
+        if self.observations is None:
+            self._allocate(observations, actions, rewards)
+
+        indices = (self.position + np.arange(observations.shape[0])) % self.capacity
+        self.observations[indices] = self._encode(observations)
+        self.actions[indices] = actions.cpu().numpy()
+        self.rewards[indices] = rewards.cpu().numpy()
+        self.next_observations[indices] = self._encode(next_observations)
+        self.discounts[indices] = discounts.cpu().numpy()
+
+        self.position = (self.position + observations.shape[0]) % self.capacity
+        self.size = min(self.size + observations.shape[0], self.capacity)
+
+        self.pushes_since_flush += 1
+        if self.pushes_since_flush >= self.flush_every:
+            self.flush()
+        return torch.from_numpy(indices)
+
+    def gather(self, indices):
+        # Sorted reads touch each page of the mapping once and in file order
+        indices = np.sort(indices.numpy())
+        return (
+            self.graph_builder.from_node_features(self._decode(self.observations[indices])),
+            torch.from_numpy(self.actions[indices].astype(np.int64)).view(-1),
+            torch.from_numpy(self.rewards[indices]).view(-1),
+            self.graph_builder.from_node_features(self._decode(self.next_observations[indices])),
+            torch.from_numpy(self.discounts[indices]).repeat_interleave(self.actions.shape[1]),
+        )
+
+    def flush(self):
+        if self.observations is None:
+            return
+        for array in (self.observations, self.next_observations, self.actions, self.rewards, self.discounts):
+            array.flush()
+        meta = {
+            'capacity': self.capacity,
+            'storage': self.storage,
+            'value_range': list(self.value_range),
+            'position': self.position,
+            'size': self.size,
+        }
+        # Write-then-rename so a crash mid-write never leaves a truncated meta.json
+        with open(self._path('meta.json.tmp'), 'w') as file:
+            json.dump(meta, file)
+        os.replace(self._path('meta.json.tmp'), self._path('meta.json'))
+        self.pushes_since_flush = 0
+
+    def state_dict(self):
+        # The transitions already live on disk, a checkpoint only records the ring position. Rows
+        # pushed after the checkpoint stay in the files, so resuming from it is not bit-exact
+        self.flush()
+        return {'directory': os.path.abspath(self.directory), 'position': self.position, 'size': self.size}
+
+    def load_state_dict(self, state):
+        if state['directory'] != os.path.abspath(self.directory):
+            raise ValueError(f"Checkpoint replay buffer lives in {state['directory']}, not {self.directory}")
+        if self.observations is None:
+            raise ValueError(f"No replay buffer to resume in {self.directory}")
+        self.position = state['position']
+        self.size = state['size']
+        self.flush()
+
+class SharedGraphReplayBuffer(GraphReplayBuffer):
+    """
+    GraphReplayBuffer in shared memory, filled by actor processes and sampled by a learner.
+
+    Storage is allocated up front with share_memory_() and the ring position and size live in a
+    shared tensor, so pickling the buffer into a spawned process (torch.multiprocessing) hands it
+    the same memory. Pushes and samples hold the same `lock`, so a sample never reads a row that
+    a push is halfway through overwriting (e.g. a new observation next to the old action).
+    """
+
+    def __init__(self, capacity, graph_builder, n_agents, n_features, lock):
+        self.counters = torch.zeros(2, dtype=torch.long).share_memory_()
+        super(SharedGraphReplayBuffer, self).__init__(capacity, graph_builder)
+        self.lock = lock
+        self.observations = torch.zeros(capacity, n_agents, n_features).share_memory_()
+        self.next_observations = torch.zeros(capacity, n_agents, n_features).share_memory_()
+        self.actions = torch.zeros(capacity, n_agents, dtype=torch.long).share_memory_()
+        self.rewards = torch.zeros(capacity, n_agents).share_memory_()
+        self.discounts = torch.zeros(capacity).share_memory_()
+
+    @property
+    def position(self):
+        return int(self.counters[0])
+
+    @position.setter
+    def position(self, value):
+        self.counters[0] = value
+
+    @property
+    def size(self):
+        return int(self.counters[1])
+
+    @size.setter
+    def size(self, value):
+        self.counters[1] = value
+
+    def push(self, observations, actions, rewards, next_observations, discounts):
+        with self.lock:
+            return super(SharedGraphReplayBuffer, self).push(observations, actions, rewards, next_observations, discounts)
+
+    def sample(self, batch_size):
+        with self.lock:
+            return super(SharedGraphReplayBuffer, self).sample(batch_size)
@@ -0,0 +1,172 @@
+import sys
+import os
+scenarios_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scenarios'))
+simulation_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'simulation'))
+sys.path.insert(0, scenarios_dir)
+sys.path.insert(1, simulation_dir)
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import torch
+from vmas import make_env
+from go_to_position_scenario import GoToPositionScenario
+from cohesion_scenario import CohesionScenario
+from flocking_scenario import FlockingScenario
+from obstacle_avoidance_scenario import ObstacleAvoidanceScenario
+from metrics_store import PUBLISHED, open_stats_store
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Scenario name -> (scenario class, checkpoint file names evaluated for n agents, first existing wins)
+SCENARIOS = {
+    'flocking': (FlockingScenario, ['flocking_model_{n_agents}.pth']),
+    'go_to_position': (GoToPositionScenario, ['go_to_position_model_{n_agents}.pth']),
+    'obstacle_avoidance': (ObstacleAvoidanceScenario, ['obstacle_model_{n_agents}.pth', 'obstacle_avoidance_model_{n_agents}.pth']),
+    'cohesion': (CohesionScenario, ['cohesion_collision.pth']),
+}
+PHASES = ('training', 'evaluation')
+
+def run_directory(stats_dir, scenario, phase, n_agents, experiment):
+    # A directory of its own per experiment, next to the published runs but never mixed with them
+    return os.path.join(stats_dir, scenario, f'{phase}_{n_agents}', experiment)
+
+def seed_csv(directory, scenario, phase, seed):
+    # Same names as the hand-run results already in stats/
+    if phase == 'evaluation':
+        return os.path.join(directory, f'{scenario}_stats_eval_{seed}.csv')
+    return os.path.join(directory, f'{scenario}_stats_{seed}.csv')
+
+def find_checkpoint(models_dir, scenario, n_agents):
+    for name in SCENARIOS[scenario][1]:
+        path = os.path.join(models_dir, name.format(n_agents=n_agents))
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No {scenario} checkpoint for {n_agents} agents in {models_dir}")
+
+def init_worker(threads):
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(threads)
+
+def run_seed(task):
+    """
+    Train or evaluate one (scenario, agent count, seed) and write its CSV.
+
+    Returns:
+    str: Path of the written CSV.
+    """
+    from train_gcn_dqn import DQNTrainer, set_seed
+    from simulator import Simulator
+
+    set_seed(task['seed'])
+    directory = run_directory(task['stats_dir'], task['scenario'], task['phase'], task['n_agents'], task['experiment'])
+    csv_path = seed_csv(directory, task['scenario'], task['phase'], task['seed'])
+    env = make_env(
+        scenario=SCENARIOS[task['scenario']][0](),
+        num_envs=task['num_envs'] if task['phase'] == 'training' else 1,
+        device="cpu",
+        continuous_actions=False,
+        wrapper=None,
+        max_steps=task['max_steps'],
+        dict_spaces=True,
+        n_agents=task['n_agents'],
+        seed=task['seed'],
+    )
+
+    if task['phase'] == 'training':
+        trainer = DQNTrainer(env)
+        trainer.train_model({
+            'model_name': os.path.join(task['models_dir'], task['experiment'], f"{task['scenario']}_model_{task['n_agents']}_{task['seed']}"),
+            'epsilon': 0.99,
+            'epsilon_decay': 0.9,
+            'min_epsilon': 0.05,
+            'episodes': task['episodes'],
+            'stats_path': csv_path,
+        })
+    else:
+        # Frozen policies come from the worker's policy registry, loaded once for all its seeds
+        simulator = Simulator(env, find_checkpoint(task['models_dir'], task['scenario'], task['n_agents']), engine="frozen")
+        simulator.run_simulation(task['episodes'], stats_path=csv_path)
+    return csv_path
+
+def write_mean(store, directory, scenario, phase, n_agents, experiment):
+    """
+    Write the per-episode mean Reward over the seeds of one experiment to directory/mean.csv, in
+    the Episode,Mean format of compute_stats_mean. Only the episodes every seed reached are kept.
+    """
+    aggregates = store.aggregates('Reward', scenario=scenario, n_agents=n_agents, phase=phase, experiment=experiment)
+    complete = aggregates[aggregates['count'] == aggregates['count'].max()]
+    mean = complete[['Episode', 'mean']].rename(columns={'mean': 'Mean'})
+    mean.to_csv(os.path.join(directory, 'mean.csv'), index=False)
+    return mean
+
+def run_seeds(scenario, phase, agent_counts, seeds, episodes, experiment, max_steps=100, num_envs=1, threads=1, workers=None, stats_dir=None, models_dir=None):
+    """
+    Run every (agent count, seed) pair in a process pool, append each finished run to the
+    experiment's group of the metrics store in stats_dir/store and write mean.csv per agent count
+    from its aggregates.
+
+    Parameters:
+    experiment (str): Name of the new runs. Their CSVs and mean.csv go to
+    stats_dir/<scenario>/<phase>_<n>/<experiment>/ and trained models to models_dir/<experiment>/,
+    so the published results are never overwritten.
+    threads (int): torch threads of each worker; workers defaults to the cores that budget allows.
+
+    Returns:
+    dict: Agent count -> list of the per-seed CSV paths.
+    """
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Unknown scenario '{scenario}', expected one of {list(SCENARIOS)}")
+    if phase not in PHASES:
+        raise ValueError(f"Unknown phase '{phase}', expected one of {list(PHASES)}")
+    if experiment == PUBLISHED:
+        raise ValueError(f"'{PUBLISHED}' holds the committed results, choose another experiment name")
+    stats_dir = stats_dir or os.path.join(ROOT_DIR, 'stats')
+    models_dir = models_dir or os.path.join(ROOT_DIR, 'models')
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+    store = open_stats_store(stats_dir)
+
+    tasks = []
+    for n_agents in agent_counts:
+        os.makedirs(run_directory(stats_dir, scenario, phase, n_agents, experiment), exist_ok=True)
+        if phase == 'training':
+            os.makedirs(os.path.join(models_dir, experiment), exist_ok=True)
+        for seed in seeds:
+            tasks.append({
+                'scenario': scenario, 'phase': phase, 'n_agents': n_agents, 'seed': seed,
+                'episodes': episodes, 'experiment': experiment, 'max_steps': max_steps, 'num_envs': num_envs,
+                'stats_dir': stats_dir, 'models_dir': models_dir,
+            })
+
+    results = {n_agents: [] for n_agents in agent_counts}
+    # Spawned workers start with a clean torch runtime and their own thread pool
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn'), initializer=init_worker, initargs=(threads,)) as pool:
+        futures = {pool.submit(run_seed, task): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            results[task['n_agents']].append(future.result())
+            store.append_csv(results[task['n_agents']][-1], scenario, task['n_agents'], phase, task['seed'], experiment)
+            print(f"Finished {scenario} {phase} with {task['n_agents']} agents, seed {task['seed']}")
+
+    for n_agents in results:
+        write_mean(store, run_directory(stats_dir, scenario, phase, n_agents, experiment), scenario, phase, n_agents, experiment)
+    return results
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Train or evaluate a scenario over several seeds in parallel.")
+    parser.add_argument('scenario', choices=list(SCENARIOS))
+    parser.add_argument('phase', choices=list(PHASES))
+    parser.add_argument('--agents', nargs='+', type=int, default=[5])
+    parser.add_argument('--seeds', nargs='+', type=int, required=True)
+    parser.add_argument('--experiment', required=True, help="Name of the new runs, kept apart from the published results")
+    parser.add_argument('--episodes', type=int, default=None, help="Default: 800 for training, 400 for evaluation")
+    parser.add_argument('--max-steps', type=int, default=100)
+    parser.add_argument('--envs', type=int, default=1, help="Batched environments per training run")
+    parser.add_argument('--threads', type=int, default=1, help="torch threads per worker")
+    parser.add_argument('--workers', type=int, default=None, help="Default: cpu_count // threads")
+    parser.add_argument('--stats-dir', default=None)
+    parser.add_argument('--models-dir', default=None)
+    args = parser.parse_args()
+
+    episodes = args.episodes or (800 if args.phase == 'training' else 400)
+    run_seeds(args.scenario, args.phase, args.agents, args.seeds, episodes, args.experiment, args.max_steps, args.envs, args.threads, args.workers, args.stats_dir, args.models_dir)
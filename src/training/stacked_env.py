@@ -0,0 +1,54 @@
+import torch
+
+class StackedEnv:
+    """
+    Wrap a discrete-action VMAS environment made with dict_spaces=True so it takes and returns
+    stacked tensors instead of per-agent dicts.
+
+    step() takes [B, N] actions and, like reset(), returns [B, N, F] observations, then [B, N]
+    rewards and [B] dones; agents are stacked in env.agents order. Any other attribute (num_envs,
+    n_agents, max_steps, scenario, world, ...) is read from the wrapped environment.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.agent_names = [agent.name for agent in env.agents]
+        self.n_actions = env.action_space[self.agent_names[0]].n
+        self.n_observations = env.observation_space[self.agent_names[0]].shape[0]
+
+    def __getattr__(self, name):
+        return getattr(self.env, name)
+
+    def stack(self, values):
+        # Per-agent dict of [B, ...] tensors -> [B, N, ...]
+        return torch.stack([values[name] for name in self.agent_names], dim=1)
+
+    def reset(self):
+        return self.stack(self.env.reset())
+
+    def step(self, actions):
+        # VMAS reshapes every agent's action in place, so each gets its own view of the column
+        observations, rewards, dones, infos = self.env.step(list(actions.unbind(dim=1)))
+        return self.stack(observations), self.stack(rewards), dones, infos
+
+    def terminated(self, dones):
+        # VMAS also reports done once max_steps is reached; that time limit is a truncation, the
+        # episode could go on, so only earlier dones end it for good
+        if self.max_steps is None:
+            return dones
+        return dones & (self.steps < self.max_steps)
+
+    def random_actions(self):
+        return torch.randint(0, self.n_actions, (self.num_envs, self.n_agents), device=self.device)
+
+    def explore(self, greedy_actions, epsilon):
+        """
+        Epsilon-greedy over every world at once: each world replaces all its agents' greedy
+        actions by random ones with probability epsilon.
+
+        Parameters:
+        greedy_actions (torch.Tensor): [B, N] greedy actions.
+        """
+        random_actions = self.random_actions()
+        explore = torch.rand(self.num_envs, 1, device=self.device) < epsilon
+        return torch.where(explore, random_actions, greedy_actions)
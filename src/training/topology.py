@@ -0,0 +1,46 @@
+import torch
+
+TOPOLOGIES = ("full", "knn", "radius")
+
+def check_topology(topology, k=None, radius=None):
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"Unknown topology '{topology}', expected one of {list(TOPOLOGIES)}")
+    if topology == "knn" and k is None:
+        raise ValueError("The 'knn' topology needs k")
+    if topology == "radius" and radius is None:
+        raise ValueError("The 'radius' topology needs a radius")
+
+def pairwise_distances(positions):
+    # positions: [B, N, 2] -> [B, N, N], computed exactly rather than through the matmul expansion
+    return torch.cdist(positions, positions, compute_mode='donot_use_mm_for_euclid_dist')
+
+def knn_adjacency(positions, k):
+    """
+    Connect every agent to its k nearest other agents.
+
+    Returns:
+    torch.Tensor: [B, N, N] boolean mask, adjacency[b, i, j] is True when j is one of the k
+    agents closest to i (edge j -> i, as in edge_index_to_adjacency).
+    """
+    distances = pairwise_distances(positions)
+    distances.diagonal(dim1=1, dim2=2).fill_(float('inf'))
+    nearest = distances.topk(min(k, positions.shape[1] - 1), dim=-1, largest=False).indices
+    return torch.zeros_like(distances, dtype=torch.bool).scatter_(-1, nearest, True)
+
+def radius_adjacency(positions, radius):
+    """
+    Connect every pair of distinct agents at most `radius` apart.
+
+    Returns:
+    torch.Tensor: [B, N, N] symmetric boolean mask without self-loops.
+    """
+    adjacency = pairwise_distances(positions) <= radius
+    adjacency.diagonal(dim1=1, dim2=2).fill_(False)
+    return adjacency
+
+def topology_adjacency(positions, topology, k=None, radius=None):
+    if topology == "knn":
+        return knn_adjacency(positions, k)
+    if topology == "radius":
+        return radius_adjacency(positions, radius)
+    raise ValueError(f"Topology '{topology}' does not depend on positions, expected 'knn' or 'radius'")
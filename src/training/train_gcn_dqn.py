@@ -8,208 +8,345 @@ import sys
 import os
 import torch
 import torch.nn.functional as F
-from torch_geometric.nn import GATConv
 from vmas import make_env
 from go_to_position_scenario import GoToPositionScenario
 from cohesion_scenario import CohesionScenario
 from flocking_scenario import FlockingScenario
 from obstacle_avoidance_scenario import ObstacleAvoidanceScenario
-from torch_geometric.data import Data, Batch
+from graph_builder import GraphBuilder
+from dense_gat import DenseGCN
+from gcn import GCN
+from replay_buffer import GraphReplayBuffer, PrioritizedGraphReplayBuffer, MemmapGraphReplayBuffer, NStepAccumulator
+from profiler import PhaseTimer
+from metrics import MetricsLogger
+from stacked_env import StackedEnv
+from checkpoint import AsyncCheckpointer, load_checkpoint, rng_state, set_rng_state
 import torch.utils.tensorboard as tensorboard
 import random
+import argparse
+import copy
 import torch.nn.utils as utils
 import torch.nn as nn
 
-class GraphReplayBuffer:
-
-    def __init__(self, capacity):
-        self.capacity = capacity
-        self.buffer = []
-        self.position = 0
-
-    def push(self, graph_observation, actions, rewards, next_graph_observation):
-        if len(self.buffer) < self.capacity:
-            self.buffer.append(None)
-        self.buffer[self.position] = (graph_observation, actions, rewards, next_graph_observation)
-        self.position = (self.position + 1) % self.capacity
-
-    def sample(self, batch_size):
-        sample = random.sample(self.buffer, batch_size)
-        observations = [s[0] for s in sample]
-        actions = [s[1] for s in sample]
-        rewards = [s[2] for s in sample]
-        next_graph_observations = [s[3] for s in sample]
-        return (Batch.from_data_list(observations), torch.cat(actions), torch.cat(rewards), Batch.from_data_list(next_graph_observations))
-
-    def __len__(self):
-        return len(self.buffer)
-
-class GCN(torch.nn.Module):
-    def __init__(self, input_dim, hidden_dim, output_dim):
-        super(GCN, self).__init__()
-        self.conv1 = GATConv(input_dim, hidden_dim, add_self_loops=False, bias=True)
-        self.conv2 = GATConv(hidden_dim, hidden_dim, add_self_loops=False, bias=True)
-        self.conv3 = GATConv(hidden_dim, hidden_dim, add_self_loops=False, bias=True)
-        self.lin1 = torch.nn.Linear(hidden_dim, hidden_dim)
-        self.lin2 = torch.nn.Linear(hidden_dim, output_dim)
-
-    def forward(self, data):
-        x, edge_index = data.x, data.edge_index
-        x = self.conv1(x, edge_index)
-        x = torch.relu(x)
-        x = self.conv2(x, edge_index)
-        x = torch.relu(x)
-        x = self.conv3(x, edge_index)
-        x = torch.relu(x)
-        x = self.lin1(x)
-        x = torch.relu(x)
-        x = self.lin2(x)
-        return x
+PRECISIONS = ("float32", "bfloat16")
 
 class DQNTrainer:
-    def __init__(self, env):
-        self.env = env
-        self.n_input = self.env.observation_space['agent0'].shape[0] + 1
-        self.n_output = env.action_space['agent0'].n
-        self.model = GCN(input_dim=self.n_input, hidden_dim=32, output_dim=self.n_output)
-        self.target_model = GCN(input_dim=self.n_input, hidden_dim=32, output_dim=self.n_output)
+    def __init__(self, env, engine="sparse", replay_capacity=6000, prioritized_replay=False, replay_directory=None, topology="full", k=None, radius=None, renderer=None, profile=False, metrics_every=100, eval_env=None, gamma=0.99, n_step=1, precision="float32"):
+        # Stacked [B, N] actions and [B, N, F] observations instead of per-agent dicts
+        self.env = env if isinstance(env, StackedEnv) else StackedEnv(env)
+        self.eval_env = eval_env if eval_env is None or isinstance(eval_env, StackedEnv) else StackedEnv(eval_env)
+        self.eval_env_owned = False
+        # Per-phase timings, exported per episode to TensorBoard when profile is set
+        self.timer = PhaseTimer(enabled=profile)
+        # Optional AsyncRenderer, without one training runs headless
+        self.renderer = renderer
+        self.engine = engine
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {list(PRECISIONS)}")
+        # With bfloat16 the forward passes run under autocast; weights, optimizer and replay stay float32
+        self.precision = precision
+        self.prioritized_replay = prioritized_replay
+        self.n_input = self.env.n_observations + 1
+        self.n_output = self.env.n_actions
+        self.graph_builder = GraphBuilder(self.env.n_agents, topology=topology, k=k, radius=radius)
+        self.eval_graph_builder = GraphBuilder(self.env.n_agents, topology=topology, k=k, radius=radius)
+        self.model = self.build_model()
+        self.target_model = self.build_model()
         self.target_model.load_state_dict(self.model.state_dict())
         self.optimizer = torch.optim.RMSprop(self.model.parameters(), lr=0.0001)
-        self.replay_buffer = GraphReplayBuffer(6000)
+        self.replay_buffer = self.build_replay_buffer(replay_capacity, replay_directory)
+        # n-step returns are computed at push time, the replay stores each transition's discount
+        self.gamma = gamma
+        self.n_step = NStepAccumulator(n_step, gamma)
         self.writer = tensorboard.SummaryWriter()
+        self.metrics = MetricsLogger(self.writer, reduce_every=metrics_every)
         self.episode_rewards = []
         self.episode_losses = []
         self.episode_obstacle_hits = []
         self.rewards_buffer = []
         self.obstacle_hits_buffer = []
+        self.eval_rewards = []
+
+    def build_model(self):
+        if self.engine == "dense":
+            return DenseGCN(input_dim=self.n_input, hidden_dim=32, output_dim=self.n_output, adjacency=self.graph_builder.adjacency())
+        if self.engine == "sparse":
+            return GCN(input_dim=self.n_input, hidden_dim=32, output_dim=self.n_output)
+        raise ValueError(f"Unknown engine '{self.engine}', expected 'sparse' or 'dense'")
+
+    def build_replay_buffer(self, capacity, directory):
+        if directory is not None:
+            if self.prioritized_replay:
+                raise ValueError("Prioritized replay is not supported with an on-disk replay buffer")
+            return MemmapGraphReplayBuffer(capacity, self.graph_builder, directory)
+        if self.prioritized_replay:
+            return PrioritizedGraphReplayBuffer(capacity, self.graph_builder)
+        return GraphReplayBuffer(capacity, self.graph_builder)
 
     def create_graph_from_observations(self, observations):
-        node_features = [observations[f'agent{i}'] for i in range(len(observations))]
-        node_features = torch.stack(node_features, dim=0).squeeze(dim=1)
-        
-        agent_ids = torch.arange(len(observations)).float().unsqueeze(1)
-        node_features = torch.cat([node_features, agent_ids], dim=1)
-        
-        num_agents = self.env.n_agents
-        edge_index = []
-        for i in range(num_agents):
-            for j in range(i + 1, num_agents):
-                edge_index.append([i, j])
-                edge_index.append([j, i])
-        edge_index.append([0,0])
-        edge_index = torch.tensor(edge_index, dtype=torch.long).t().contiguous()
-        graph_data = Data(x=node_features, edge_index=edge_index)
-        return graph_data
+        return self.graph_builder.build(observations)
+
+    def select_actions(self, logits, epsilon):
+        greedy_actions = torch.argmax(logits, dim=1).view(self.env.num_envs, self.env.n_agents)
+        return self.env.explore(greedy_actions, epsilon)
     
-    def train_step_dqn(self, batch_size, model, target_model, ticks, gamma=0.99, update_target_every=10):
+    def autocast(self):
+        return torch.autocast(torch.device(self.env.device).type, dtype=torch.bfloat16, enabled=self.precision == "bfloat16")
+
+    def push_transitions(self, transitions):
+        if transitions is not None:
+            self.replay_buffer.push(*transitions)
+
+    def train_step_dqn(self, batch_size, model, target_model, ticks, update_target_every=10):
         if len(self.replay_buffer) < batch_size:
             return 0
         model.train()
         self.optimizer.zero_grad()
-        obs, actions, rewards, nextObs = self.replay_buffer.sample(batch_size)
+        with self.timer.phase('replay_sample'):
+            if self.prioritized_replay:
+                obs, actions, rewards, nextObs, discounts, indices, weights = self.replay_buffer.sample(batch_size)
+            else:
+                obs, actions, rewards, nextObs, discounts = self.replay_buffer.sample(batch_size)
 
-        values = model(obs).gather(1, actions.unsqueeze(1))
-        nextValues = target_model(nextObs).max(dim=1)[0].detach()
-        targetValues = rewards + gamma * nextValues
-        loss = nn.SmoothL1Loss()(values, targetValues.unsqueeze(1))
+        with self.timer.phase('learner_forward'):
+            with self.autocast():
+                q_values = model(obs)
+                next_q_values = target_model(nextObs)
+            # The loss and TD errors are computed in float32
+            values = q_values.float().gather(1, actions.unsqueeze(1))
+            nextValues = next_q_values.float().max(dim=1)[0].detach()
+            targetValues = rewards + discounts * nextValues
+            if self.prioritized_replay:
+                # Priorities and importance-sampling weights are per transition, shared by its agents
+                losses = nn.SmoothL1Loss(reduction='none')(values, targetValues.unsqueeze(1)).view(batch_size, -1)
+                loss = (losses.mean(dim=1) * weights).mean()
+                td_errors = (targetValues - values.squeeze(1)).detach().view(batch_size, -1).abs().mean(dim=1)
+                self.replay_buffer.update_priorities(indices, td_errors)
+            else:
+                loss = nn.SmoothL1Loss()(values, targetValues.unsqueeze(1))
         self.optimizer.zero_grad()
-        loss.backward()
-        torch.nn.utils.clip_grad_value_(model.parameters(), 1)
-        self.optimizer.step()
+        with self.timer.phase('backward'):
+            loss.backward()
+        with self.timer.phase('optimizer_step'):
+            torch.nn.utils.clip_grad_value_(model.parameters(), 1)
+            self.optimizer.step()
             
         if ticks % update_target_every == 0:
-            target_model.load_state_dict(model.state_dict())
-        self.writer.add_scalar('Loss', loss.item(), ticks)
-        return loss.item()
+            with self.timer.phase('target_sync'):
+                target_model.load_state_dict(model.state_dict())
+        loss = loss.detach()
+        self.metrics.add('Loss', loss)
+        return loss
+
+    def checkpoint_state(self, episode, epsilon, ticks):
+        """
+        Everything train_model needs to continue after `episode` completed episodes, as copies
+        that later training steps do not modify. Taken at an episode boundary, where the n-step
+        window has been flushed and the next episode starts with a reset.
+        """
+        return {
+            'episode': episode,
+            'epsilon': epsilon,
+            'ticks': ticks,
+            'model': {name: value.clone() for name, value in self.model.state_dict().items()},
+            'target_model': {name: value.clone() for name, value in self.target_model.state_dict().items()},
+            'optimizer': copy.deepcopy(self.optimizer.state_dict()),
+            'replay_buffer': self.replay_buffer.state_dict(),
+            'history': {
+                'episode_rewards': list(self.episode_rewards),
+                'episode_losses': list(self.episode_losses),
+                'episode_obstacle_hits': list(self.episode_obstacle_hits),
+                'rewards_buffer': list(self.rewards_buffer),
+                'obstacle_hits_buffer': list(self.obstacle_hits_buffer),
+                'eval_rewards': list(self.eval_rewards),
+            },
+            'rng': rng_state(),
+        }
+
+    def load_checkpoint_state(self, state):
+        """
+        Restore a checkpoint_state into this trainer, including the global RNG states.
+
+        Returns:
+        tuple: (completed episodes, epsilon, ticks) to continue train_model from.
+        """
+        self.model.load_state_dict(state['model'])
+        self.target_model.load_state_dict(state['target_model'])
+        self.optimizer.load_state_dict(state['optimizer'])
+        self.replay_buffer.load_state_dict(state['replay_buffer'])
+        for name, values in state['history'].items():
+            setattr(self, name, list(values))
+        set_rng_state(state['rng'])
+        return state['episode'], state['epsilon'], state['ticks']
 
     def train_model(self, config):
+        """
+        Besides the exploration schedule, episodes and model_name, config takes:
+        checkpoint_dir: Directory of the periodic checkpoints, written in the background every
+        checkpoint_every (10) episodes and after the last one. None (default) disables them.
+        resume: A checkpoint, or a directory whose newest checkpoint is used, to continue from
+        with the same config. Continuing an in-memory replay run reproduces the uninterrupted
+        run exactly.
+        """
         model_name = config["model_name"]
         epsilon = config["epsilon"]
         epsilon_decay = config["epsilon_decay"]
         min_epsilon = config["min_epsilon"]
         episodes = config["episodes"]
+        render_every = config.get("render_every", 100)
+        # Greedy evaluation of eval_episodes parallel episodes every eval_every training episodes
+        eval_every = config.get("eval_every")
+        eval_episodes = config.get("eval_episodes", 10)
+        checkpoint_every = config.get("checkpoint_every", 10)
+        checkpointer = AsyncCheckpointer(config["checkpoint_dir"]) if config.get("checkpoint_dir") else None
+        start = 0
         ticks = 0
+        if config.get("resume"):
+            start, epsilon, ticks = self.load_checkpoint_state(load_checkpoint(config["resume"], self.env.device))
+            print(f"Resuming after episode {start - 1} from {config['resume']}")
+            if self.eval_rewards and self.eval_env is None:
+                # Creating the evaluation env seeds its first episodes, the interrupted run had already done that
+                with torch.random.fork_rng(devices=[]):
+                    self.eval_env = self.make_eval_env(eval_episodes)
+                self.eval_env_owned = True
+
+        try:
+            for episode in range(start, episodes):  
+                observations = self.env.reset()    
+                with self.timer.phase('graph_build'):
+                    graph_data = self.create_graph_from_observations(observations)
+                episode_loss = 0
+                total_episode_reward = torch.zeros(self.env.num_envs, self.env.n_agents)
+                render = self.renderer is not None and episode % render_every == 0
+
+                for _ in range(self.env.max_steps):
+                    if render:
+                        with self.timer.phase('render'):
+                            self.renderer.submit()
+                    ticks += 1
+                    self.model.eval()
+                    with self.timer.phase('forward'), torch.no_grad(), self.autocast():
+                        logits = self.model(graph_data)
 
-        for episode in range(episodes):  
-            observations = self.env.reset()    
-            episode_loss = 0
-            total_episode_reward = torch.zeros(self.env.n_agents)
-
-            for _ in range(self.env.max_steps):
-                if episode % 100 == 0:
-                    self.env.render(
-                        mode="rgb_array",
-                        agent_index_focus=None,
-                        visualize_when_rgb=True,
-                    )
-                ticks += 1
-                graph_data = self.create_graph_from_observations(observations)
-                self.model.eval()
-                logits = self.model(graph_data)
-
-                if random.random() < epsilon:
-                    actions = torch.tensor([random.randint(0, 8) for _ in range(len(self.env.agents))])
-                else:
-                    actions = torch.argmax(logits, dim=1)
-                actions_dict = {f'agent{i}': torch.tensor([actions[i].item()]) for i in range(len(self.env.agents))}
-                newObservations, rewards, done, _ = self.env.step(actions_dict)
-
-                rewards_tensor = torch.tensor([rewards[f'agent{i}'] for i in range(len(self.env.agents))], dtype=torch.float)
-                self.replay_buffer.push(graph_data, actions, rewards_tensor, self.create_graph_from_observations(newObservations))
+                    with self.timer.phase('select_actions'):
+                        actions = self.select_actions(logits, epsilon)
+                    with self.timer.phase('env_step'):
+                        newObservations, rewards, done, _ = self.env.step(actions)
+
+                    rewards_tensor = rewards.float()
+                    with self.timer.phase('graph_build'):
+                        next_graph_data = self.create_graph_from_observations(newObservations)
+                    with self.timer.phase('replay_push'):
+                        self.push_transitions(self.n_step.push(
+                            self.graph_builder.node_features(graph_data),
+                            actions,
+                            rewards_tensor,
+                            self.graph_builder.node_features(next_graph_data),
+                            self.env.terminated(done),
+                        ))
                 
-                self.writer.add_scalar('Reward', rewards_tensor.sum().item(), ticks)
-                loss = self.train_step_dqn(128, self.model, self.target_model, ticks, update_target_every=10)
-                episode_loss += loss
-                total_episode_reward += rewards_tensor
-                observations = newObservations
+                    self.metrics.add('Reward', rewards_tensor.sum(dim=1).mean())
+                    loss = self.train_step_dqn(128, self.model, self.target_model, ticks, update_target_every=10)
+                    self.metrics.end_tick(ticks)
+                    episode_loss += loss
+                    total_episode_reward += rewards_tensor
+                    graph_data = next_graph_data
 
-            epsilon = max(min_epsilon, epsilon * epsilon_decay)
+                with self.timer.phase('replay_push'):
+                    self.push_transitions(self.n_step.flush())
+                if render:
+                    self.renderer.end_episode()
+                self.timer.end_episode(self.metrics, episode)
+                epsilon = max(min_epsilon, epsilon * epsilon_decay)
             
-            average_loss = episode_loss / self.env.max_steps
-            self.episode_losses.append(average_loss)
-            self.rewards_buffer.append(total_episode_reward[0])
+                average_loss = float(episode_loss) / self.env.max_steps
+                self.episode_losses.append(average_loss)
+                self.rewards_buffer.append(total_episode_reward[:, 0].mean())
+
+                if (episode + 1) % 10 == 0:
+                    mean_reward = sum(self.rewards_buffer) / 10
+                    self.episode_rewards.append(mean_reward)
+                    self.rewards_buffer = []
+
+                    mean_hits = sum(self.obstacle_hits_buffer) / 10
+                    self.episode_obstacle_hits.append(mean_hits)
+                    self.obstacle_hits_buffer = []
 
-            if (episode + 1) % 10 == 0:
-                mean_reward = sum(self.rewards_buffer) / 10
-                self.episode_rewards.append(mean_reward)
-                self.rewards_buffer = []
+                if eval_every is not None and (episode + 1) % eval_every == 0:
+                    eval_rewards = self.evaluate_policy(eval_episodes)
+                    self.eval_rewards.append(eval_rewards)
+                    self.metrics.add_scalar('EvalReward', eval_rewards.mean().item(), episode)
 
-                mean_hits = sum(self.obstacle_hits_buffer) / 10
-                self.episode_obstacle_hits.append(mean_hits)
-                self.obstacle_hits_buffer = []
-                """ # Run evaluation after every 10 episodes of training
-                eval_reward = self.evaluate_policy(10)
-                self.episode_rewards.append(eval_reward) """
+                print(f'Episode {episode}, Loss: {average_loss}, Reward: {total_episode_reward.sum(dim=1).mean().item()}, Epsilon: {epsilon}')
 
-            print(f'Episode {episode}, Loss: {average_loss}, Reward: {total_episode_reward.sum().item()}, Epsilon: {epsilon}')
+                if checkpointer is not None and ((episode + 1) % checkpoint_every == 0 or episode + 1 == episodes):
+                    with self.timer.phase('checkpoint'):
+                        checkpointer.save(self.checkpoint_state(episode + 1, epsilon, ticks))
+
+            if isinstance(self.replay_buffer, MemmapGraphReplayBuffer):
+                self.replay_buffer.flush()
+            if checkpointer is not None:
+                checkpointer.close()
+        finally:
+            # Writes what is left and stops the writer thread, also when training fails
+            self.metrics.close(ticks)
 
         print("Training completed")
+        if self.timer.enabled:
+            print(self.timer.summary())
         torch.save(self.model.state_dict(), model_name + '.pth')
         print("Model saved successfully!")
 
-        self.save_metrics_to_csv()
+        self.save_metrics_to_csv(config.get("stats_path", 'obstacle_avoidance_stats_4842.csv'))
+
+    def make_eval_env(self, num_envs):
+        return StackedEnv(make_env(
+            scenario=type(self.env.scenario)(),
+            num_envs=num_envs,
+            device=self.env.device,
+            continuous_actions=False,
+            wrapper=None,
+            max_steps=self.env.max_steps,
+            dict_spaces=True,
+            n_agents=self.env.n_agents,
+        ))
 
     def evaluate_policy(self, eval_episodes):
-        total_eval_reward = 0
-        for _ in range(eval_episodes):
-            observations = self.env.reset()
-            episode_reward = torch.zeros(self.env.n_agents)
-            for _ in range(self.env.max_steps):
-                graph_data = self.create_graph_from_observations(observations)
-                self.model.eval()
-                with torch.no_grad():
-                    logits = self.model(graph_data)
-                actions = torch.argmax(logits, dim=1)
-                actions_dict = {f'agent{i}': torch.tensor([actions[i].item()]) for i in range(len(self.env.agents))}
-                newObservations, rewards, done, _ = self.env.step(actions_dict)
-                rewards_tensor = torch.tensor([rewards[f'agent{i}'] for i in range(len(self.env.agents))], dtype=torch.float)
-                episode_reward += rewards_tensor
-                observations = newObservations
-            total_eval_reward += episode_reward[0]
-        return total_eval_reward / eval_episodes
-
-    def save_metrics_to_csv(self):
-        with open('obstacle_avoidance_stats_4842.csv', mode='w', newline='') as file:
+        """
+        Run eval_episodes greedy episodes at once on a separate vectorized environment.
+
+        The evaluation env has one world per episode (pass eval_env to the constructor to use a
+        differently configured one; its worlds are then run in as many rounds as needed), every
+        step is a single batched forward under torch.inference_mode, and the global RNG state is
+        restored afterwards so evaluating does not change the training run.
+
+        Returns:
+        torch.Tensor: [eval_episodes] total reward of agent 0 in each episode.
+        """
+        self.model.eval()
+        episode_rewards = []
+        with torch.random.fork_rng(devices=[]):
+            if self.eval_env is None or (self.eval_env_owned and self.eval_env.num_envs != eval_episodes):
+                self.eval_env = self.make_eval_env(eval_episodes)
+                self.eval_env_owned = True
+            env = self.eval_env
+
+            for _ in range(-(-eval_episodes // env.num_envs)):
+                observations = env.reset()
+                episode_reward = torch.zeros(env.num_envs, env.n_agents)
+                for _ in range(env.max_steps):
+                    graph_data = self.eval_graph_builder.build(observations)
+                    with torch.inference_mode(), self.autocast():
+                        logits = self.model(graph_data)
+                    # Outside inference mode so VMAS can modify the actions in place
+                    actions = logits.argmax(dim=1).view(env.num_envs, env.n_agents)
+                    observations, rewards, done, _ = env.step(actions)
+                    episode_reward += rewards
+                episode_rewards.append(episode_reward[:, 0])
+        return torch.cat(episode_rewards)[:eval_episodes]
+
+    def save_metrics_to_csv(self, path='obstacle_avoidance_stats_4842.csv'):
+        with open(path, mode='w', newline='') as file:
             writer = csv.writer(file)
             writer.writerow(['Episode', 'Reward'])
             for i in range(len(self.episode_losses)):
@@ -226,13 +363,20 @@ def set_seed(seed):
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description="Train the obstacle avoidance policy.")
+    parser.add_argument('--num-envs', type=int, default=1, help="Batched environments; each episode collects num_envs times the transitions")
+    parser.add_argument('--checkpoint-dir', default='checkpoints/obstacle_model_5_4')
+    parser.add_argument('--checkpoint-every', type=int, default=10, help="Episodes between checkpoints")
+    parser.add_argument('--resume', nargs='?', const=True, default=None, help="Continue from a checkpoint (default: the newest in --checkpoint-dir)")
+    args = parser.parse_args()
+
     SEED = 4842
 
     set_seed(SEED)
 
     env = make_env(
         scenario=ObstacleAvoidanceScenario(),
-        num_envs=1,
+        num_envs=args.num_envs,
         device="cpu",
         continuous_actions=False,
         wrapper=None,
@@ -247,7 +391,10 @@ if __name__ == "__main__":
         'epsilon': 0.99,
         'epsilon_decay' : 0.9,
         'min_epsilon' : 0.05,
-        'episodes' : 800
+        'episodes' : 800,
+        'checkpoint_dir': args.checkpoint_dir,
+        'checkpoint_every': args.checkpoint_every,
+        'resume': args.checkpoint_dir if args.resume is True else args.resume,
     }
     
     trainer = DQNTrainer(env)
@@ -15,6 +15,9 @@ from ray.tune import register_env
 from typing import Dict
 import numpy as np
 from test_gcn_rllib import use_vmas_env
+from dense_gat import DenseGCN, fully_connected_adjacency
+from topology import topology_adjacency
+from graph_builder import adjacency_to_edge_index
 import os
 
 RLLIB_NUM_GPUS = int(os.environ.get("RLLIB_NUM_GPUS", "0"))
@@ -47,8 +50,9 @@ class GNNModel(torch.nn.Module):
         x = self.lin2(x)
         return x
 
-def build_graph(observations):
+def build_graph(observations, adjacency=None):
     # Input observations: Tensor of shape [num_agents, batch_size, num_features]
+    # adjacency: optional [batch_size, num_agents, num_agents] mask replacing the fully connected graph
     num_agents, batch_size, num_features = observations.shape
 
     #print("BATCH_SIZE: ", batch_size, " NUM_AGENTS: ", num_agents, " NUM_FEATURES: ", num_features)
@@ -59,6 +63,9 @@ def build_graph(observations):
 
     #print("NODE_FEATURES SHAPE: ", node_features.shape)
 
+    if adjacency is not None:
+        return Data(x=node_features, edge_index=adjacency_to_edge_index(adjacency))
+
     # Create edge index
     edge_index = []
     for b in range(batch_size):
@@ -79,8 +86,16 @@ class CustomGNNModel(TorchModelV2, torch.nn.Module):
         input_dim = 6  # Number of features per agent (6)
         hidden_dim = model_config.get("custom_model_config", {}).get("hidden_dim", 32)
         output_dim = 9  # Should match the number of actions (9)
+        self.engine = model_config.get("custom_model_config", {}).get("engine", "sparse")
+        # "full", or "knn" / "radius" graphs recomputed every forward from the agent positions
+        self.topology = model_config.get("custom_model_config", {}).get("topology", "full")
+        self.k = model_config.get("custom_model_config", {}).get("k")
+        self.radius = model_config.get("custom_model_config", {}).get("radius")
 
-        self.gnn = GNNModel(input_dim, hidden_dim, output_dim)
+        if self.engine == "dense":
+            self.gnn = DenseGCN(input_dim, hidden_dim, output_dim)
+        else:
+            self.gnn = GNNModel(input_dim, hidden_dim, output_dim)
 
     def forward(self, input_dict, state, seq_lens):
         agent_states = torch.stack(input_dict["obs"])
@@ -89,8 +104,18 @@ class CustomGNNModel(TorchModelV2, torch.nn.Module):
 
         num_agents, batch_size, _ = agent_states.shape
 
-        graph_data = build_graph(agent_states)
-        logits = self.gnn(graph_data)
+        adjacency = None
+        if self.topology != "full":
+            adjacency = topology_adjacency(agent_states.permute(1, 0, 2)[..., :2], self.topology, self.k, self.radius)
+
+        if self.engine == "dense":
+            # Dense engine works on [batch_size, num_agents, num_features] directly
+            if adjacency is None:
+                adjacency = fully_connected_adjacency(num_agents)
+            logits = self.gnn.forward_dense(agent_states.permute(1, 0, 2), adjacency)
+        else:
+            graph_data = build_graph(agent_states, adjacency)
+            logits = self.gnn(graph_data)
 
         #print("LOGITS BEFORE: ", logits.shape)
 
@@ -144,6 +169,8 @@ config = {
         "custom_model": "custom_gnn_model",
         "custom_model_config": {
             "hidden_dim": 32,
+            "engine": "sparse",
+            "topology": "full",
         },
     },
     "framework": "torch",
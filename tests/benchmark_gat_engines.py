@@ -0,0 +1,55 @@
+import sys
+import os
+import time
+import torch
+
+training_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'training'))
+sys.path.insert(0, training_dir)
+
+from gcn import GCN
+from dense_gat import DenseGCN
+from graph_builder import GraphBuilder
+
+N_FEATURES = 6
+N_ACTIONS = 9
+REPEATS = 50
+
+def time_forward(model, graph_data):
+    with torch.no_grad():
+        for _ in range(5):
+            model(graph_data)
+        init_time = time.perf_counter()
+        for _ in range(REPEATS):
+            model(graph_data)
+    return (time.perf_counter() - init_time) / REPEATS
+
+def benchmark(n_agents, batch_size):
+    builder = GraphBuilder(n_agents)
+    observations = {f'agent{i}': torch.randn(batch_size, N_FEATURES) for i in range(n_agents)}
+    graph_data = builder.build(observations)
+
+    sparse_model = GCN(input_dim=N_FEATURES + 1, hidden_dim=32, output_dim=N_ACTIONS).eval()
+    dense_model = DenseGCN.from_sparse(sparse_model, builder.adjacency()).eval()
+
+    with torch.no_grad():
+        max_error = (sparse_model(graph_data) - dense_model(graph_data)).abs().max().item()
+
+    return time_forward(sparse_model, graph_data), time_forward(dense_model, graph_data), max_error
+
+if __name__ == "__main__":
+
+    torch.set_num_threads(1)
+
+    for batch_size in [1, 8, 128]:
+        print(f"Batch size {batch_size}")
+        print(f"{'agents':>8} {'sparse (ms)':>12} {'dense (ms)':>12} {'speedup':>8} {'max err':>10}")
+        crossover = None
+        for n_agents in [5, 9, 12, 25, 50, 100]:
+            sparse_time, dense_time, max_error = benchmark(n_agents, batch_size)
+            if crossover is None and dense_time > sparse_time:
+                crossover = n_agents
+            print(f"{n_agents:>8} {sparse_time * 1e3:>12.3f} {dense_time * 1e3:>12.3f} {sparse_time / dense_time:>8.2f} {max_error:>10.2e}")
+        if crossover is None:
+            print("Dense engine is faster at every size tested\n")
+        else:
+            print(f"Sparse engine becomes faster at {crossover} agents\n")
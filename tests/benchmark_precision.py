@@ -0,0 +1,122 @@
+import sys
+import os
+import argparse
+import json
+import platform
+import time
+import torch
+from vmas import make_env
+
+scenarios_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'scenarios'))
+training_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'training'))
+
+sys.path.insert(0, scenarios_dir)
+sys.path.insert(1, training_dir)
+
+from train_gcn_dqn import DQNTrainer, PRECISIONS, set_seed
+from go_to_position_scenario import GoToPositionScenario
+from cohesion_scenario import CohesionScenario
+from flocking_scenario import FlockingScenario
+from obstacle_avoidance_scenario import ObstacleAvoidanceScenario
+
+SCENARIOS = {
+    'go_to_position': GoToPositionScenario,
+    'flocking': FlockingScenario,
+    'obstacle_avoidance': ObstacleAvoidanceScenario,
+    'cohesion': CohesionScenario,
+}
+# Learner phases timed by train_step_dqn, one call of each per update
+UPDATE_PHASES = ('replay_sample', 'learner_forward', 'backward', 'optimizer_step')
+
+def benchmark(scenario, precision, engine, n_agents, num_envs, episodes, max_steps, eval_episodes, seed, directory):
+    """
+    Train one policy from scratch with the given precision and evaluate it greedily.
+
+    Returns:
+    dict: Mean per-update learner time (replay sampling, forward, backward and optimizer step),
+    total training time and the final mean evaluation reward of agent 0.
+    """
+    set_seed(seed)
+    env = make_env(
+        scenario=SCENARIOS[scenario](),
+        num_envs=num_envs,
+        device="cpu",
+        continuous_actions=False,
+        wrapper=None,
+        max_steps=max_steps,
+        dict_spaces=True,
+        n_agents=n_agents,
+        seed=seed,
+    )
+    trainer = DQNTrainer(env, engine=engine, profile=True, precision=precision)
+    name = os.path.join(directory, f'{scenario}_{engine}_{precision}')
+    init_time = time.perf_counter()
+    trainer.train_model({
+        'model_name': name,
+        'epsilon': 0.99,
+        'epsilon_decay': 0.9,
+        'min_epsilon': 0.05,
+        'episodes': episodes,
+        'stats_path': name + '.csv',
+    })
+    train_time = time.perf_counter() - init_time
+
+    updates = trainer.timer.total_calls.get('backward', 0)
+    update_time = sum(trainer.timer.total_times.get(phase, 0.0) for phase in UPDATE_PHASES)
+    return {
+        'scenario': scenario,
+        'precision': precision,
+        'engine': engine,
+        'n_agents': n_agents,
+        'episodes': episodes,
+        'updates': updates,
+        'update_time_ms': update_time / max(1, updates) * 1e3,
+        'train_time_s': train_time,
+        'eval_reward': trainer.evaluate_policy(eval_episodes).mean().item(),
+    }
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare float32 and bfloat16 autocast training on CPU.")
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--engine', choices=['sparse', 'dense'], default='sparse')
+    parser.add_argument('--agents', type=int, default=5)
+    parser.add_argument('--envs', type=int, default=4)
+    parser.add_argument('--episodes', type=int, default=20)
+    parser.add_argument('--max-steps', type=int, default=100)
+    parser.add_argument('--eval-episodes', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--models-dir', default='.', help="Where the trained models and stats CSVs are written")
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+
+    results = []
+    for scenario in args.scenarios:
+        for precision in PRECISIONS:
+            results.append(benchmark(scenario, precision, args.engine, args.agents, args.envs, args.episodes, args.max_steps, args.eval_episodes, args.seed, args.models_dir))
+            print(
+                f"{scenario} {precision}: {results[-1]['update_time_ms']:.2f} ms/update, "
+                f"{results[-1]['train_time_s']:.1f} s training, eval reward {results[-1]['eval_reward']:.2f}",
+                file=sys.stderr,
+            )
+
+    report = {
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'cpu_capability': torch.backends.cpu.get_cpu_capability(),
+            'torch': torch.__version__,
+            'threads': torch.get_num_threads(),
+        },
+        'results': results,
+    }
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
@@ -0,0 +1,105 @@
+import sys
+import os
+import argparse
+import json
+import platform
+import torch
+from vmas import make_env
+
+scenarios_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'scenarios'))
+training_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'training'))
+simulation_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'simulation'))
+
+sys.path.insert(0, scenarios_dir)
+sys.path.insert(1, training_dir)
+sys.path.insert(2, simulation_dir)
+
+from go_to_position_scenario import GoToPositionScenario
+from cohesion_scenario import CohesionScenario
+from flocking_scenario import FlockingScenario
+from obstacle_avoidance_scenario import ObstacleAvoidanceScenario
+from simulator import Simulator
+
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'models'))
+
+# Checkpoint file name prefix -> scenario it was trained on
+SCENARIOS = {
+    'flocking': FlockingScenario,
+    'go_to_position': GoToPositionScenario,
+    'reach_different_positions': GoToPositionScenario,
+    'obstacle': ObstacleAvoidanceScenario,
+    'cohesion': CohesionScenario,
+}
+
+def scenario_for(checkpoint):
+    for prefix, scenario in SCENARIOS.items():
+        if checkpoint.startswith(prefix):
+            return scenario
+    raise ValueError(f"Cannot tell the scenario of '{checkpoint}', expected a name starting with one of {list(SCENARIOS)}")
+
+def trained_agents(checkpoint):
+    # flocking_model_9.pth -> 9, checkpoints without a trailing count were trained with 5 agents
+    suffix = os.path.splitext(checkpoint)[0].rsplit('_', 1)[-1]
+    return int(suffix) if suffix.isdigit() else 5
+
+def benchmark(checkpoint, n_agents, num_envs, episodes, max_steps, engine, seed):
+    env = make_env(
+        scenario=scenario_for(checkpoint)(),
+        num_envs=num_envs,
+        device="cpu",
+        continuous_actions=False,
+        wrapper=None,
+        max_steps=max_steps,
+        dict_spaces=True,
+        n_agents=n_agents,
+        seed=seed,
+    )
+    simulator = Simulator(env, os.path.join(MODELS_DIR, checkpoint), engine=engine)
+    result = {'checkpoint': checkpoint, 'engine': engine}
+    result.update(simulator.run_benchmark(episodes))
+    return result
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark trained policies in the simulator without rendering.")
+    parser.add_argument('--models', nargs='+', default=['flocking_model_9.pth'], help="Checkpoints in models/, or 'all'")
+    parser.add_argument('--agents', nargs='+', type=int, default=None, help="Agent counts (default: the count each checkpoint was trained with)")
+    parser.add_argument('--envs', nargs='+', type=int, default=[1], help="Numbers of batched environments")
+    parser.add_argument('--episodes', type=int, default=5)
+    parser.add_argument('--max-steps', type=int, default=100)
+    parser.add_argument('--engine', choices=['sparse', 'dense', 'frozen'], default='sparse', help="'frozen' exports the checkpoints with export_policy first")
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+    checkpoints = sorted(name for name in os.listdir(MODELS_DIR) if name.endswith('.pth')) if args.models == ['all'] else args.models
+
+    results = []
+    for checkpoint in checkpoints:
+        for n_agents in args.agents or [trained_agents(checkpoint)]:
+            for num_envs in args.envs:
+                results.append(benchmark(checkpoint, n_agents, num_envs, args.episodes, args.max_steps, args.engine, args.seed))
+                print(
+                    f"{checkpoint} agents={n_agents} envs={num_envs}: {results[-1]['steps_per_sec']:.1f} steps/s, "
+                    f"{results[-1]['agent_steps_per_sec']:.1f} agent-steps/s, {results[-1]['inference_fraction'] * 100:.1f}% inference",
+                    file=sys.stderr,
+                )
+
+    report = {
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'torch': torch.__version__,
+            'threads': torch.get_num_threads(),
+        },
+        'results': results,
+    }
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
@@ -1,18 +1,18 @@
+import os
 import pandas as pd
 import glob
 
 # Define the path where your CSV files are located
 path = ''  # Update this path if needed
 file_pattern = '*.csv'
-files = glob.glob(path + file_pattern)
+# Only per-seed runs: files with 'mean' in their name are already averaged, as in the metrics store
+files = [file for file in glob.glob(path + file_pattern) if file != path + 'output.csv' and 'mean' not in os.path.basename(file)]
 
 if not files:
     raise FileNotFoundError("No CSV files found in the specified directory.")
 
-# Initialize a list to store DataFrames
+# Read every CSV file once
 dfs = []
-
-# Read and store each CSV file into the list
 for file in files:
     try:
         data = pd.read_csv(file)
@@ -24,26 +24,22 @@ for file in files:
 if not dfs:
     raise ValueError("No valid CSV files could be read.")
 
-# Merge all DataFrames on the 'Episode' column
-all_data = dfs[0]
-for df in dfs[1:]:
-    all_data = pd.merge(all_data, df, on='Episode', suffixes=('', '_dup'))
-
-# Drop duplicate 'Episode' columns if they exist
-all_data = all_data.loc[:, ~all_data.columns.duplicated()]
-
-# Ensure the DataFrame is not empty and has the correct structure
+# Stack all runs and average every value column per episode in a single pass. Only episodes
+# present in every file are kept, like the inner merges this used to chain.
+all_data = pd.concat(dfs, ignore_index=True)
 if all_data.empty or 'Episode' not in all_data.columns:
     raise ValueError("Merged data is empty or does not contain 'Episode' column.")
 
-# Calculate the mean for each episode (excluding 'Episode' column itself)
-all_data['Mean'] = all_data.drop(columns='Episode').mean(axis=1)
-
-# Select only the 'Episode' and 'Mean' columns for the output
-output_data = all_data[['Episode', 'Mean']]
+grouped = all_data.groupby('Episode')
+complete = grouped.size() == len(dfs)
+output_data = grouped.mean().mean(axis=1)[complete].rename('Mean').reset_index()
 
 # Save the result to a new CSV file
 output_file = 'output.csv'
 output_data.to_csv(output_file, index=False)
 
 print(f"Results have been written to {output_file}")
+
+# The committed stats/**/mean.csv files are published results and are never rewritten. The per-seed
+# CSVs can also be queried through the metrics store once imported (python src/training/metrics_store.py):
+#   open_stats_store('stats').aggregates('Reward', scenario=..., n_agents=..., phase=...)
@@ -2,7 +2,6 @@ from curses.ascii import SI
 import sys
 import os
 from vmas import make_env
-import torch
 
 scenarios_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'scenarios'))
 training_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'training'))
@@ -12,9 +11,10 @@ sys.path.insert(0, scenarios_dir)
 sys.path.insert(1, training_dir)
 sys.path.insert(2, simulation_dir)
 
-from train_gcn_dqn import GCN
+from export_policy import load_frozen_policy
 from cohesion_scenario import CohesionScenario
 from simulator import Simulator
+from async_renderer import AsyncRenderer
 
 if __name__ == "__main__":
 
@@ -33,11 +33,11 @@ if __name__ == "__main__":
 
     models_dir = "models/"
 
-    model = GCN(input_dim=5, hidden_dim=32, output_dim=9)
-    model.load_state_dict(torch.load(models_dir + 'cohesion_collision.pth'))
-
-    model.eval()
+    # Frozen TorchScript export of the checkpoint, created on first use
+    model = load_frozen_policy(models_dir + 'cohesion_collision.pth', n_agents=9)
     print("Cohesion model loaded successfully!")
 
-    simulator = Simulator(env, model)
-    simulator.run_simulation()
\ No newline at end of file
+    renderer = AsyncRenderer(env, visualize=True)
+    simulator = Simulator(env, model, renderer=renderer)
+    simulator.run_simulation()
+    renderer.close()
\ No newline at end of file
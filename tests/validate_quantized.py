@@ -0,0 +1,154 @@
+import sys
+import os
+import argparse
+import json
+import torch
+from vmas import make_env
+
+scenarios_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'scenarios'))
+training_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'training'))
+simulation_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'simulation'))
+
+sys.path.insert(0, scenarios_dir)
+sys.path.insert(1, training_dir)
+sys.path.insert(2, simulation_dir)
+
+from simulator import Simulator
+from export_policy import QUANTIZATION, export_policy, load_policy
+from benchmark_simulator import MODELS_DIR, scenario_for, trained_agents
+
+def make_simulator(checkpoint, policy, n_agents, num_envs, max_steps, seed):
+    env = make_env(
+        scenario=scenario_for(checkpoint)(),
+        num_envs=num_envs,
+        device="cpu",
+        continuous_actions=False,
+        wrapper=None,
+        max_steps=max_steps,
+        dict_spaces=True,
+        n_agents=n_agents,
+        seed=seed,
+    )
+    return Simulator(env, policy)
+
+def action_agreement(simulator, quantized, episodes):
+    # Both policies act on the float policy's trajectories, so every decision is compared on the same observations
+    agree = total = 0
+    for _ in range(episodes):
+        observations = simulator.env.reset()
+        for _ in range(simulator.env.max_steps):
+            actions = simulator.select_actions(observations)
+            with torch.no_grad():
+                quantized_actions = quantized(observations).argmax(dim=-1)
+            agree += (actions == quantized_actions).sum().item()
+            total += actions.numel()
+            observations, _, _, _ = simulator.env.step(actions)
+    return agree / total
+
+def mean_reward(simulator, episodes):
+    # Mean total reward of agent 0 per episode, as in the stats CSVs
+    rewards = []
+    for _ in range(episodes):
+        observations = simulator.env.reset()
+        episode_reward = torch.zeros(simulator.env.num_envs)
+        for _ in range(simulator.env.max_steps):
+            observations, step_rewards, _, _ = simulator.env.step(simulator.select_actions(observations))
+            episode_reward += step_rewards[:, 0]
+        rewards.append(episode_reward)
+    return torch.cat(rewards).mean().item()
+
+def validate(checkpoint, n_agents, modes, num_envs, episodes, max_steps, seed, tolerance):
+    """
+    Compare quantized exports of a checkpoint against its float export in the simulator.
+
+    Dynamic quantization needs no calibration data (activation scales are computed per call),
+    so the calibration episodes are the evaluation itself: every policy runs the same seeded
+    episodes. A mode is accepted, and its policy kept next to the checkpoint where
+    load_frozen_policy(..., quantize=mode) finds it, only when the relative reward delta is
+    within tolerance; otherwise its policy is deleted.
+
+    Returns:
+    list: One dict per mode with action agreement, rewards and their delta, inference speedup,
+    artifact sizes and the verdict.
+    """
+    path = os.path.join(MODELS_DIR, checkpoint)
+    float_path = export_policy(path, n_agents)
+    float_policy = load_policy(float_path)
+    float_reward = mean_reward(make_simulator(checkpoint, float_policy, n_agents, num_envs, max_steps, seed), episodes)
+    float_timing = make_simulator(checkpoint, float_policy, n_agents, num_envs, max_steps, seed).run_benchmark(episodes)
+
+    results = []
+    for mode in modes:
+        quantized_path = export_policy(path, n_agents, quantize=mode)
+        quantized_policy = load_policy(quantized_path)
+        agreement = action_agreement(make_simulator(checkpoint, float_policy, n_agents, num_envs, max_steps, seed), quantized_policy, episodes)
+        quantized_reward = mean_reward(make_simulator(checkpoint, quantized_policy, n_agents, num_envs, max_steps, seed), episodes)
+        quantized_timing = make_simulator(checkpoint, quantized_policy, n_agents, num_envs, max_steps, seed).run_benchmark(episodes)
+
+        reward_delta = quantized_reward - float_reward
+        relative_delta = abs(reward_delta) / max(abs(float_reward), 1e-8)
+        float_size, quantized_size = os.path.getsize(float_path), os.path.getsize(quantized_path)
+        accepted = relative_delta <= tolerance
+        if not accepted:
+            os.remove(quantized_path)
+
+        results.append({
+            'checkpoint': checkpoint,
+            'mode': mode,
+            'n_agents': n_agents,
+            'num_envs': num_envs,
+            'episodes': episodes,
+            'action_agreement': agreement,
+            'float_reward': float_reward,
+            'quantized_reward': quantized_reward,
+            'reward_delta': reward_delta,
+            'relative_reward_delta': relative_delta,
+            'tolerance': tolerance,
+            'float_inference_time_s': float_timing['inference_time_s'],
+            'quantized_inference_time_s': quantized_timing['inference_time_s'],
+            'speedup': float_timing['inference_time_s'] / quantized_timing['inference_time_s'],
+            'float_size_bytes': float_size,
+            'quantized_size_bytes': quantized_size,
+            'size_reduction': 1 - quantized_size / float_size,
+            'accepted': accepted,
+            'policy': quantized_path if accepted else None,
+        })
+    return results
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Validate quantized policies against their float versions in the simulator.")
+    parser.add_argument('--models', nargs='+', default=['flocking_model_9.pth'], help="Checkpoints in models/, or 'all'")
+    parser.add_argument('--modes', nargs='+', choices=list(QUANTIZATION), default=list(QUANTIZATION))
+    parser.add_argument('--agents', type=int, default=None, help="Agent count (default: the count each checkpoint was trained with)")
+    parser.add_argument('--envs', type=int, default=16, help="Batched environments per episode")
+    parser.add_argument('--episodes', type=int, default=5)
+    parser.add_argument('--max-steps', type=int, default=100)
+    parser.add_argument('--tolerance', type=float, default=0.05, help="Accepted relative reward delta")
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+    checkpoints = sorted(name for name in os.listdir(MODELS_DIR) if name.endswith('.pth')) if args.models == ['all'] else args.models
+
+    results = []
+    for checkpoint in checkpoints:
+        for result in validate(checkpoint, args.agents or trained_agents(checkpoint), args.modes, args.envs, args.episodes, args.max_steps, args.seed, args.tolerance):
+            results.append(result)
+            print(
+                f"{checkpoint} {result['mode']}: {'accepted' if result['accepted'] else 'REJECTED'}, {result['action_agreement'] * 100:.1f}% agreement, "
+                f"reward {result['float_reward']:.2f} -> {result['quantized_reward']:.2f}, {result['speedup']:.2f}x inference, "
+                f"{result['size_reduction'] * 100:.0f}% smaller",
+                file=sys.stderr,
+            )
+
+    if args.output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    # Non-zero exit when any checkpoint was rejected, so scripts can gate on it
+    sys.exit(0 if all(result['accepted'] for result in results) else 1)